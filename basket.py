@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import instrument
+import kernel
+from dates import NO_DAY, day_to_date
+
+# Пороги по умолчанию: доля корзин с набором и доверие правила
+MIN_SUPPORT = 0.01
+MIN_CONFIDENCE = 0.3
+
+# Наибольший размер набора товаров
+MAX_LEN = 3
+
+# Набор из одной корзины частым не считается, как бы мала ни была выборка
+MIN_ORDERS = 2
+
+# Статус выполненного заказа (см. funnel.STAGES)
+COMPLETED = 'Выполнен'
+
+
+# Строки корзин из факта строк звездной схемы (star.py): суррогатные ключи
+# заказа и товара, номер дня, магазин и признак выполненного заказа;
+# названия товаров — по ключам измерения товаров
+def prepare(line_fact, product_dim, store_dim):
+    line_fact = line_fact[(line_fact['order_key'] >= 0)
+                          & (line_fact['product_key'] >= 0)]
+    orders = line_fact['order_key'].to_numpy()
+    lines = pd.DataFrame({
+        'Заказ': orders,
+        'Товар': line_fact['product_key'].to_numpy(),
+        'Дата': line_fact['Дата'].to_numpy(),
+        'Магазин': pd.Categorical(
+            store_dim['Магазин'].reindex(line_fact['store_key']).to_numpy()
+        ),
+        'Выполнен': (line_fact['Статус заказа'] == COMPLETED).to_numpy(),
+    })
+    # Заказ выполнен, если хотя бы одна его строка в статусе «Выполнен»
+    done = kernel.aggregate(lines, ['Заказ'], ['Выполнен'])
+    lines['Выполнен'] = done['Выполнен'].to_numpy()[
+        np.searchsorted(done['Заказ'].to_numpy(), orders)
+    ] > 0
+
+    # Товар без SKU различается по UUID
+    skus = product_dim['SKU'].fillna(product_dim['UUID товара']).astype(str)
+    names = product_dim['Наименование'].fillna(skus).astype(str)
+    # SKU дописывается только к повторяющимся названиям
+    repeated = names.duplicated(keep=False)
+    names[repeated] = names[repeated] + ' (' + skus[repeated] + ')'
+    return lines, names.to_numpy()
+
+
+# Первый и последний день строк корзин (None — дат нет)
+def period(lines):
+    days = lines['Дата'].to_numpy()
+    days = days[days != NO_DAY]
+    if not len(days):
+        return None
+    first, last = day_to_date([days.min(), days.max()]).tolist()
+    return first, last
+
+
+# Состояние фильтров страницы: только отличающиеся от «все строки»
+def normalize(lines, date_range=None, stores=None, abandoned=False):
+    state = {}
+    if date_range and len(date_range) == 2 \
+            and tuple(date_range) != period(lines):
+        state['Дата'] = tuple(date_range)
+    if stores:
+        state['Магазин'] = tuple(sorted(stores, key=str))
+    if abandoned:
+        state['abandoned'] = True
+    return state
+
+
+# Строки под состояние фильтров: период, магазины, только невыполненные
+def select(lines, filter_state):
+    keep = np.ones(len(lines), dtype=bool)
+    if 'Дата' in filter_state:
+        start, end = (np.datetime64(d, 'D').astype('int64')
+                      for d in filter_state['Дата'])
+        days = lines['Дата'].to_numpy()
+        keep &= (days >= start) & (days <= end)
+    if 'Магазин' in filter_state:
+        keep &= lines['Магазин'].isin(filter_state['Магазин']).to_numpy()
+    if filter_state.get('abandoned'):
+        keep &= ~lines['Выполнен'].to_numpy()
+    return lines[keep]
+
+
+# Разреженная матрица заказ × товар (1 — товар есть в корзине)
+def incidence(lines):
+    orders = np.unique(lines['Заказ'].to_numpy(), return_inverse=True)[1]
+    items = lines['Товар'].to_numpy()
+    n_items = int(items.max()) + 1 if len(items) else 0
+    matrix = sparse.csr_matrix(
+        (np.ones(len(lines), dtype='int32'), (orders, items)),
+        shape=(int(orders.max()) + 1 if len(orders) else 0, n_items)
+    )
+    matrix.data[:] = 1
+    return matrix
+
+
+# Частые наборы товаров в духе FP-growth: редкие товары отбрасываются
+# первым проходом, остальные упорядочиваются по убыванию частоты.
+# Набор растет только более частыми товарами, а счетчики продолжений
+# считаются по условной базе — строкам матрицы, где есть весь набор
+# (список заказов набора сужается пересечением со столбцом товара)
+def frequent_itemsets(matrix, min_support=MIN_SUPPORT, max_len=MAX_LEN):
+    n_orders = matrix.shape[0]
+    min_count = max(MIN_ORDERS, int(np.ceil(min_support * n_orders)))
+    counts = np.asarray(matrix.sum(axis=0)).ravel()
+    frequent = np.flatnonzero(counts >= min_count)
+    frequent = frequent[np.argsort(-counts[frequent], kind='stable')]
+
+    rows = matrix[:, frequent].tocsr()
+    columns = rows.tocsc()
+    found = []
+
+    def grow(prefix, orders, limit):
+        extension = np.asarray(rows[orders, :limit].sum(axis=0)).ravel()
+        for item in np.flatnonzero(extension >= min_count):
+            itemset = prefix + (item,)
+            found.append((itemset, int(extension[item])))
+            if len(itemset) < max_len and item > 0:
+                column = columns.indices[columns.indptr[item]:
+                                         columns.indptr[item + 1]]
+                grow(itemset, np.intersect1d(orders, column,
+                                             assume_unique=True), item)
+
+    for item in range(len(frequent)):
+        found.append(((item,), int(counts[frequent[item]])))
+        if max_len > 1 and item > 0:
+            grow((item,), columns.indices[columns.indptr[item]:
+                                          columns.indptr[item + 1]], item)
+    # Номера столбцов частых товаров -> коды товаров
+    return [(tuple(frequent[list(items)]), count) for items, count in found], \
+        n_orders
+
+
+# Правила «набор → товар» с поддержкой, доверием и лифтом
+def association_rules(itemsets, n_orders, min_confidence=MIN_CONFIDENCE):
+    support = {frozenset(items): count for items, count in itemsets}
+    rules = []
+    for items, count in itemsets:
+        if len(items) < 2:
+            continue
+        for consequent in items:
+            antecedent = frozenset(items) - {consequent}
+            confidence = count / support[antecedent]
+            if confidence < min_confidence:
+                continue
+            lift = confidence / (support[frozenset([consequent])] / n_orders)
+            rules.append((tuple(sorted(antecedent)), consequent, count,
+                          confidence, lift))
+    return rules
+
+
+# Анализ корзин по отобранным строкам: частые наборы и правила по названиям
+def analyze(lines, names, min_support=MIN_SUPPORT,
+            min_confidence=MIN_CONFIDENCE, max_len=MAX_LEN):
+    with instrument.stage('basket:incidence'):
+        matrix = incidence(lines)
+    with instrument.stage('basket:itemsets'):
+        itemsets, n_orders = frequent_itemsets(matrix, min_support, max_len)
+    with instrument.stage('basket:rules'):
+        rules = association_rules(itemsets, n_orders, min_confidence)
+
+    def label(items):
+        return ' + '.join(names[list(items)])
+
+    itemsets = pd.DataFrame({
+        'Товары': [label(items) for items, _ in itemsets],
+        'Размер': [len(items) for items, _ in itemsets],
+        'Заказы': [count for _, count in itemsets],
+    }, columns=['Товары', 'Размер', 'Заказы'])
+    itemsets['Поддержка'] = itemsets['Заказы'] / max(n_orders, 1)
+    rules = pd.DataFrame({
+        'Если': [label(a) for a, _, _, _, _ in rules],
+        'То': [names[c] for _, c, _, _, _ in rules],
+        'Заказы': [count for _, _, count, _, _ in rules],
+        'Доверие': [conf for _, _, _, conf, _ in rules],
+        'Лифт': [lift for _, _, _, _, lift in rules],
+    }, columns=['Если', 'То', 'Заказы', 'Доверие', 'Лифт'])
+    rules.insert(3, 'Поддержка', rules['Заказы'] / max(n_orders, 1))
+    return {
+        'orders': n_orders,
+        'items': int(np.count_nonzero(np.diff(matrix.tocsc().indptr))),
+        'itemsets': itemsets.sort_values(['Размер', 'Заказы'],
+                                         ascending=[False, False]),
+        'rules': rules.sort_values('Лифт', ascending=False),
+    }
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.io as pio
+import pyarrow
+
+import charts
+import engine
+import ingest
+import kernel
+import rollup
+import schema
+import synth
+from result_cache import ResultCache
+from shared import open_snapshot
+from store import ingest_frame, read_rollup, read_store
+from xlsx_reader import read_xlsx
+
+# Размеры (число заказов) по умолчанию
+SIZES = [10_000, 100_000, 1_000_000]
+
+# Размеры (число строк) для сравнения ядра группировки с pandas
+KERNEL_SIZES = [1_000_000, 10_000_000]
+
+
+# Замер этапа: время и, по желанию, пик выделенной памяти
+class Bench:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    def run(self, name, func, *args, **kwargs):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        stage = {'seconds': round(elapsed, 6)}
+        if self.trace_memory:
+            stage['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 3)
+            tracemalloc.stop()
+        self.stages[name] = stage
+        return result
+
+
+# Исходная агрегация dashboard.py по сырым строкам — точка отсчета
+def baseline_stats(df, column):
+    return df.groupby(column).agg({
+        'Сумма заказа': 'sum',
+        'Магазин': 'count'
+    }).rename(columns={
+        'Магазин': 'Количество корзин',
+        'Сумма заказа': 'Сумма заказов'
+    }).reset_index()
+
+
+def baseline_dates(df):
+    return pd.to_datetime(df['Дата статуса'], format='%d.%m.%Y %H:%M:%S').dt.date
+
+
+def _figures(bench, prefix, store_stats, daily_stats):
+    top_5_stores = store_stats.nlargest(5, 'Сумма заказов')
+    figures = [
+        bench.run(f'{prefix}figure_top_stores', charts.top_stores_figure,
+                  top_5_stores),
+        bench.run(f'{prefix}figure_avg_check', charts.avg_check_figure,
+                  top_5_stores),
+        bench.run(f'{prefix}figure_daily', charts.daily_figure, daily_stats),
+    ]
+    # Сериализация, которую выполняет st.plotly_chart
+    bench.run(f'{prefix}figure_json',
+              lambda: [pio.to_json(fig, validate=False) for fig in figures])
+
+    # Повторный показ: готовый JSON из кэша графиков
+    cache = ResultCache()
+    data = [('top_stores', top_5_stores), ('avg_check', top_5_stores),
+            ('daily', daily_stats)]
+    for chart, df in data:
+        charts.cached_figure(cache, chart, df)
+    bench.run(f'{prefix}figure_cache_hit',
+              lambda: [charts.cached_figure(cache, chart, df)
+                       for chart, df in data])
+
+
+def _queries(bench, prefix, query_engine):
+    bench.run(f'{prefix}kpis', query_engine.kpis)
+    store_stats = bench.run(f'{prefix}store_stats', query_engine.store_stats)
+    daily_stats = bench.run(f'{prefix}daily_stats', query_engine.daily_stats)
+    return store_stats, daily_stats
+
+
+# Замеры на одном размере данных
+def run_size(orders, tmp, excel=False, history=False, trace_memory=False):
+    bench = Bench(trace_memory)
+    orders_df, products_df = bench.run('generate', synth.generate, orders,
+                                       history=history)
+
+    if excel:
+        path = os.path.join(tmp, f'orders_{orders}.xlsx')
+        synth.write_xlsx(orders_df, path)
+        cache_dir = os.path.join(tmp, f'cache_{orders}')
+        bench.run('load_read_excel', pd.read_excel, path)
+        bench.run('load_read_xlsx', read_xlsx, path)
+        bench.run('load_convert_parquet', ingest.convert, path, cache_dir)
+        bench.run('load_parquet', ingest.read_table, path, cache_dir)
+
+    store_dir = os.path.join(tmp, f'store_{orders}')
+    bench.run('ingest', ingest_frame, orders_df, store_dir)
+    raw = bench.run('load_store', read_store, store_dir)
+    bench.run('load_schema', schema.apply, raw)
+    bench.run('load_snapshot', open_snapshot, store_dir)
+
+    # Исходный путь: даты и группировки по сырым строкам на каждый перезапуск
+    raw = raw.assign(Дата=bench.run('baseline_dates', baseline_dates, raw))
+    bench.run('baseline_store_stats', baseline_stats, raw, 'Магазин')
+    bench.run('baseline_daily_stats', baseline_stats, raw, 'Дата')
+
+    bench.run('rollup_build', rollup.build, raw)
+    agg = bench.run('rollup_load', read_rollup, store_dir)
+    store_stats, daily_stats = _queries(bench, 'pandas_',
+                                        engine.PandasEngine(agg))
+    _figures(bench, '', store_stats, daily_stats)
+
+    if 'duckdb' in engine.available_engines():
+        duck = bench.run('duckdb_connect', engine.DuckDBEngine, store_dir)
+        _queries(bench, 'duckdb_', duck)
+
+    return {
+        'orders': orders,
+        'order_rows': len(orders_df),
+        'product_rows': len(products_df),
+        'stages': bench.stages,
+    }
+
+
+# Строки в схеме снимка без генерации заказов: номер дня, магазин
+# (категория), сумма; 10 млн строк synth строил бы слишком долго
+def kernel_frame(rows, days=730, stores=60, seed=0):
+    rng = np.random.default_rng(seed)
+    names = [f'Магазин {i}' for i in range(stores)]
+    return pd.DataFrame({
+        'Дата': rng.integers(19_000, 19_000 + days, rows).astype('int32'),
+        'Магазин': pd.Categorical.from_codes(rng.integers(0, stores, rows),
+                                             names),
+        'Сумма заказа': rng.integers(100, 50_000, rows).astype('int32'),
+    })
+
+
+def pandas_aggregate(df, by):
+    grouped = df.groupby(by, dropna=False, observed=True)
+    agg = grouped[['Сумма заказа']].sum()
+    agg[rollup.COUNT] = grouped.size()
+    return agg.reset_index()
+
+
+# Группировка pandas и целочисленное ядро на одних и тех же строках
+def run_kernel(rows, trace_memory=False):
+    bench = Bench(trace_memory)
+    df = bench.run('generate', kernel_frame, rows)
+    for name, by in [('store', ['Магазин']), ('day', ['Дата']),
+                     ('day_store', ['Дата', 'Магазин'])]:
+        expected = bench.run(f'pandas_{name}', pandas_aggregate, df, by)
+        result = bench.run(f'kernel_{name}', kernel.aggregate, df, by,
+                           ['Сумма заказа'], rollup.COUNT)
+        if not np.array_equal(expected[rollup.COUNT], result[rollup.COUNT]):
+            raise AssertionError(f'{name}: ядро расходится с pandas')
+    return {'orders': rows, 'order_rows': rows, 'product_rows': 0,
+            'stages': bench.stages}
+
+
+def environment():
+    versions = {'pandas': pd.__version__, 'numpy': np.__version__,
+                'pyarrow': pyarrow.__version__, 'plotly': plotly.__version__}
+    if engine.duckdb is not None:
+        versions['duckdb'] = engine.duckdb.__version__
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'versions': versions,
+    }
+
+
+def run(sizes=SIZES, excel=False, history=False, trace_memory=False,
+        kernel_only=False):
+    if kernel_only:
+        results = [run_kernel(rows, trace_memory) for rows in sizes]
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = [run_size(orders, tmp, excel, history, trace_memory)
+                       for orders in sizes]
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'options': {'excel': excel, 'history': history,
+                    'trace_memory': trace_memory, 'kernel': kernel_only},
+        'results': results,
+        # ru_maxrss в Linux — в килобайтах
+        'peak_rss_mb': round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Замеры дашборда на синтетических данных')
+    parser.add_argument('sizes', nargs='*', type=int,
+                        help='число заказов (с --kernel — строк)')
+    parser.add_argument('--excel', action='store_true',
+                        help='замерить и чтение xlsx (долго на больших размерах)')
+    parser.add_argument('--history', action='store_true',
+                        help='строка на каждый статус заказа')
+    parser.add_argument('--memory', action='store_true',
+                        help='пик памяти по этапам (tracemalloc, замедляет замеры)')
+    parser.add_argument('--kernel', action='store_true',
+                        help='только группировка: pandas против kernel.py')
+    parser.add_argument('--output', default='benchmark.json')
+    args = parser.parse_args()
+
+    sizes = args.sizes or (KERNEL_SIZES if args.kernel else SIZES)
+    report = run(sizes, args.excel, args.history, args.memory, args.kernel)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    table = pd.DataFrame({
+        result['orders']: {name: stage['seconds']
+                           for name, stage in result['stages'].items()}
+        for result in report['results']
+    })
+    print(table.to_string())
+    print(f'Пик RSS: {report["peak_rss_mb"]} МБ, результаты: {args.output}')
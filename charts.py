@@ -0,0 +1,235 @@
+import hashlib
+import json
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+import instrument
+
+# Число точек, начиная с которого линии рисуются через WebGL, а не SVG
+WEBGL_THRESHOLD = 1000
+
+
+# График топ-5 магазинов: сумма заказов и количество корзин
+def top_stores_figure(top_5_stores):
+    fig = go.Figure()
+
+    # Добавляем столбцы для суммы заказов
+    fig.add_trace(go.Bar(
+        x=top_5_stores['Магазин'],
+        y=top_5_stores['Сумма заказов'],
+        name='Сумма заказов',
+        marker_color='#8884d8'
+    ))
+
+    # Добавляем столбцы для количества корзин
+    fig.add_trace(go.Bar(
+        x=top_5_stores['Магазин'],
+        y=top_5_stores['Количество корзин'],
+        name='Количество корзин',
+        marker_color='#82ca9d',
+        yaxis='y2'
+    ))
+
+    # Настройка макета
+    fig.update_layout(
+        title='Топ-5 магазинов: сумма заказов и количество корзин',
+        yaxis=dict(
+            title='Сумма заказов',
+            title_font=dict(color='#8884d8'),
+            tickfont=dict(color='#8884d8')
+        ),
+        yaxis2=dict(
+            title='Количество корзин',
+            title_font=dict(color='#82ca9d'),
+            tickfont=dict(color='#82ca9d'),
+            overlaying='y',
+            side='right'
+        ),
+        barmode='group',
+        height=600
+    )
+
+    return fig
+
+
+# График среднего чека по магазинам
+def avg_check_figure(top_5_stores):
+    fig = px.bar(
+        top_5_stores,
+        x='Магазин',
+        y='Средний чек',
+        title='Средний чек по магазинам',
+        height=400
+    )
+    fig.update_traces(marker_color='#ffc658')
+
+    return fig
+
+
+# График динамики по дням
+def daily_figure(daily_stats):
+    fig = go.Figure()
+    scatter = go.Scattergl if len(daily_stats) > WEBGL_THRESHOLD else go.Scatter
+
+    # Добавляем линию для суммы заказов
+    fig.add_trace(scatter(
+        x=daily_stats['Дата'],
+        y=daily_stats['Сумма заказов'],
+        name='Сумма заказов',
+        line=dict(color='#8884d8')
+    ))
+
+    # Добавляем линию для количества корзин
+    fig.add_trace(scatter(
+        x=daily_stats['Дата'],
+        y=daily_stats['Количество корзин'],
+        name='Количество корзин',
+        line=dict(color='#82ca9d'),
+        yaxis='y2'
+    ))
+
+    # Настройка макета
+    fig.update_layout(
+        title='Динамика брошенных корзин по дням',
+        yaxis=dict(
+            title='Сумма заказов',
+            title_font=dict(color='#8884d8'),
+            tickfont=dict(color='#8884d8')
+        ),
+        yaxis2=dict(
+            title='Количество корзин',
+            title_font=dict(color='#82ca9d'),
+            tickfont=dict(color='#82ca9d'),
+            overlaying='y',
+            side='right'
+        ),
+        height=500
+    )
+
+    return fig
+
+
+# Воронка статусов: сколько заказов дошло до каждого этапа
+def funnel_figure(stages):
+    fig = go.Figure(go.Funnel(
+        y=stages['Этап'],
+        x=stages['Заказы'],
+        textinfo='value+percent initial',
+        marker=dict(color='#8884d8')
+    ))
+    fig.update_layout(title='Воронка статусов заказов', height=450)
+
+    return fig
+
+
+# Доля брошенных заказов по дням
+def abandonment_figure(daily_rates):
+    scatter = go.Scattergl if len(daily_rates) > WEBGL_THRESHOLD else go.Scatter
+    fig = go.Figure(scatter(
+        x=daily_rates['Дата'],
+        y=daily_rates['Доля брошенных'],
+        name='Доля брошенных',
+        line=dict(color='#ff7f7f')
+    ))
+    fig.update_layout(
+        title='Доля брошенных заказов по дням',
+        yaxis=dict(title='Доля брошенных', tickformat='.0%'),
+        height=400
+    )
+
+    return fig
+
+
+# Потери брошенных корзин по дням: все и за вычетом возвращенных
+def recovery_figure(daily_recovery):
+    fig = go.Figure()
+    scatter = go.Scattergl if len(daily_recovery) > WEBGL_THRESHOLD \
+        else go.Scatter
+
+    fig.add_trace(scatter(
+        x=daily_recovery['Дата'],
+        y=daily_recovery['Сумма потерь'],
+        name='Сумма потерь',
+        line=dict(color='#8884d8')
+    ))
+    fig.add_trace(scatter(
+        x=daily_recovery['Дата'],
+        y=daily_recovery['Чистые потери'],
+        name='Чистые потери',
+        line=dict(color='#ff7f7f')
+    ))
+    fig.update_layout(title='Потери и возврат брошенных корзин по дням',
+                      height=450)
+
+    return fig
+
+
+# Тепловая карта когорт: строки — неделя первого заказа, столбцы —
+# недели после нее, значения — доли покупателей когорты
+def _cohort_figure(cohort_table, title):
+    weeks = [col for col in cohort_table.columns if col.startswith('Неделя')]
+    fig = go.Figure(go.Heatmap(
+        z=cohort_table[weeks].to_numpy(),
+        x=weeks,
+        y=cohort_table['Когорта'].dt.strftime('%d.%m.%Y'),
+        colorscale='Purples',
+        zmin=0,
+        hovertemplate='%{y}, %{x}: %{z:.1%}<extra></extra>'
+    ))
+    fig.update_layout(
+        title=title,
+        yaxis=dict(title='Неделя первого заказа', autorange='reversed'),
+        height=max(400, 14 * len(cohort_table))
+    )
+
+    return fig
+
+
+def cohort_orders_figure(cohort_table):
+    return _cohort_figure(cohort_table, 'Повторные выполненные заказы по когортам')
+
+
+def cohort_abandoned_figure(cohort_table):
+    return _cohort_figure(cohort_table, 'Повторные брошенные корзины по когортам')
+
+
+# Построители графиков по типу
+BUILDERS = {
+    'top_stores': top_stores_figure,
+    'avg_check': avg_check_figure,
+    'daily': daily_figure,
+    'funnel': funnel_figure,
+    'abandonment': abandonment_figure,
+    'recovery': recovery_figure,
+    'cohort_orders': cohort_orders_figure,
+    'cohort_abandoned': cohort_abandoned_figure,
+}
+
+
+# Хэш агрегированных данных графика (колонки и значения, без индекса)
+def data_hash(df):
+    digest = hashlib.blake2b(repr(list(df.columns)).encode(), digest_size=16)
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# Готовый к отправке JSON графика (проверки Plotly уже пройдены при сборке)
+def figure_json(chart, df):
+    return pio.to_json(BUILDERS[chart](df), validate=False)
+
+
+# Фигура из готового JSON без валидаторов Plotly: st.plotly_chart не
+# проверяет объекты Figure повторно, а словарь проверил бы целиком
+def from_json(spec):
+    return go.Figure(json.loads(spec), _validate=False)
+
+
+# График через кэш JSON по (хэш данных, тип графика, тема)
+def cached_figure(cache, chart, df, theme='streamlit'):
+    with instrument.stage(f'figure:{chart}'):
+        spec = cache.get((data_hash(df), chart, theme),
+                         lambda: figure_json(chart, df))
+        return from_json(spec)
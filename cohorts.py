@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import funnel
+import instrument
+import kernel
+from dates import NO_DAY, day_to_date
+
+# Сколько недель после первой показывается в матрице когорт
+MAX_WEEKS = 12
+
+# Номер дня 0 (1970-01-01) — четверг: недели начинаются с понедельника
+_WEEK_SHIFT = 3
+
+
+def _weeks(days):
+    return (days + _WEEK_SHIFT) // 7
+
+
+def _week_start(weeks):
+    return day_to_date(weeks * 7 - _WEEK_SHIFT).astype('datetime64[s]')
+
+
+# Доли покупателей когорты с хотя бы одним заказом через k недель после
+# первой: разреженная матрица покупатель × смещение недели (повторы
+# схлопываются), затем сумма по когортам умножением на разреженную
+# матрицу принадлежности когорта × покупатель
+def _rates(members, customers, offsets, sizes, horizon, n_customers):
+    weeks = max(len(sizes), MAX_WEEKS + 1)
+    hits = sparse.csr_matrix(
+        (np.ones(len(customers), dtype='int32'), (customers, offsets)),
+        shape=(n_customers, weeks)
+    )
+    hits.data[:] = 1
+    counts = (members @ hits).toarray()[:, 1:MAX_WEEKS + 1]
+    rates = counts / np.maximum(sizes, 1)[:, None]
+    # Недели после последнего дня данных еще не наступили
+    rates[np.arange(1, rates.shape[1] + 1) > horizon[:, None]] = np.nan
+    return rates
+
+
+# Когорты покупателей по неделе первого заказа: доли повторных выполненных
+# заказов и повторных брошенных корзин в последующие недели. Покупатели
+# кодируются целыми числами, матрицы покупатель × неделя — разреженные
+def cohort_tables(df, rows=None):
+    orders = funnel.order_sequences(df, rows, ['UUID Покупателя'])
+    days = orders['Дата'].to_numpy()
+    keep = orders['UUID Покупателя'].notna().to_numpy() & (days != NO_DAY)
+    orders = orders[keep]
+    days = days[keep]
+
+    with instrument.stage('cohorts:matrix'):
+        customers, n_customers, _ = kernel.factorize(orders['UUID Покупателя'])
+        weeks = _weeks(days.astype('int64'))
+        first_week = weeks.min() if len(weeks) else 0
+        weeks = weeks - first_week
+        n_weeks = int(weeks.max()) + 1 if len(weeks) else 1
+
+        # Неделя первого заказа: первый столбец строки CSR (индексы
+        # отсортированы после схлопывания повторов)
+        activity = sparse.csr_matrix(
+            (np.ones(len(customers), dtype='int32'), (customers, weeks)),
+            shape=(n_customers, n_weeks)
+        )
+        activity.sum_duplicates()
+        cohort = activity.indices[activity.indptr[:-1]]
+        members = sparse.csr_matrix(
+            (np.ones(n_customers, dtype='int32'),
+             (cohort, np.arange(n_customers))),
+            shape=(n_weeks, n_customers)
+        )
+        sizes = np.bincount(cohort, minlength=n_weeks)
+        horizon = n_weeks - 1 - np.arange(n_weeks)
+
+        offsets = weeks - cohort[customers]
+        completed = orders['Этап'].to_numpy() == len(funnel.STAGES) - 1
+        tables = {}
+        for name, selected in (('orders', completed),
+                               ('abandoned', ~completed)):
+            rates = _rates(members, customers[selected], offsets[selected],
+                           sizes, horizon, n_customers)
+            tables[name] = _frame(rates, sizes, first_week)
+    return tables
+
+
+def _frame(rates, sizes, first_week):
+    present = sizes > 0
+    frame = pd.DataFrame({
+        'Когорта': _week_start(np.flatnonzero(present) + first_week),
+        'Покупатели': sizes[present],
+    })
+    for k in range(rates.shape[1]):
+        frame[f'Неделя {k + 1}'] = rates[present, k]
+    return frame
@@ -1,21 +1,50 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+
+import charts
+import cohorts
+import filters
+import funnel
+import hll
+import instrument
+import recovery
+from downsample import CHART_WIDTH, downsample
+from engine import (DEFAULT_ENGINE, DuckDBEngine, PandasEngine,
+                    available_engines)
+from result_cache import QueryContext, ResultCache, cache_key
+from refresh import start_worker
 
 # Настройка страницы
 st.set_page_config(page_title='Анализ брошенных корзин', layout='wide')
 
-# Функция для загрузки и подготовки данных
-@st.cache_data
-def load_data():
-    # Загрузка данных из Excel
-    df = pd.read_excel('combined_report.xlsx')
-    
-    # Правильное преобразование даты с указанием формата
-    df['Дата'] = pd.to_datetime(df['Дата статуса'], format='%d.%m.%Y %H:%M:%S').dt.date
-    
-    return df
+# Фоновое обновление данных, одно на процесс. Новые выгрузки загружаются
+# и готовятся вне запросов пользователей: строки в компактной схеме
+# (категории, UUID в 16 байтах, суммы в целых тенге, даты номерами дней)
+# отображаются в память из общего снимка Arrow, рядом — битовые карты
+# фильтров и агрегаты. Все сессии делят одни и те же объекты, менять их нельзя
+@st.cache_resource
+def load_worker():
+    return start_worker()
+
+# Соединение DuckDB одно на процесс и версию данных, общее для всех сессий
+@st.cache_resource(max_entries=1)
+def load_duckdb(version):
+    return DuckDBEngine()
+
+# Кэш результатов запросов, общий для всех сессий
+@st.cache_resource
+def load_result_cache():
+    return ResultCache()
+
+# Кэш готовых графиков (JSON) по хэшу их данных, общий для всех сессий
+@st.cache_resource
+def load_figure_cache():
+    return ResultCache()
+
+# Движок запросов: pandas по агрегатам или DuckDB по строкам на диске
+def get_engine(name, dataset):
+    if name == 'duckdb':
+        return load_duckdb(dataset.version)
+    return PandasEngine(dataset.rollup)
 
 # Функция форматирования чисел
 def format_number(num):
@@ -26,18 +55,75 @@ def format_number(num):
     return f'{num:.0f} ₸'
 
 try:
-    # Загрузка данных
-    df = load_data()
+    # Замеры этапов: DASH_PROFILE=1 или ?debug=1 в адресе страницы
+    instrument.start('page', instrument.ENABLED
+                     or st.query_params.get('debug') == '1')
+
+    # Последняя готовая версия данных; весь запуск страницы работает с ней,
+    # даже если фоновое обновление подменит версию по ходу
+    with instrument.stage('load'):
+        worker = load_worker()
+    dataset = worker.current
+    version = dataset.version
+
+    # Переключатель движка для сравнения pandas и DuckDB
+    engines = available_engines()
+    engine_name = st.sidebar.selectbox(
+        'Движок запросов', engines,
+        index=engines.index(DEFAULT_ENGINE) if DEFAULT_ENGINE in engines else 0
+    )
+    engine = get_engine(engine_name, dataset)
+
+    # Фильтры: без выбора запросы идут через движок, с выбором — по строкам,
+    # отобранным пересечением битовых карт
+    index = dataset.index
+    st.sidebar.header('Фильтры')
+    date_range = index.date_range()
+    if date_range:
+        date_range = st.sidebar.date_input(
+            'Период', value=date_range,
+            min_value=date_range[0], max_value=date_range[1]
+        )
+    selected = {
+        col: st.sidebar.multiselect(filters.LABELS[col], index.options(col))
+        for col in filters.FILTER_COLUMNS if index.options(col)
+    }
+    filter_state = filters.normalize(index, date_range, selected)
+    exact_distinct = st.sidebar.checkbox(
+        'Точный подсчет уникальных',
+        help=f'Для выборок до {hll.EXACT_LIMIT:,} строк; '
+             'иначе — оценка HyperLogLog'
+    )
+
+    # Движок под состояние фильтров: без фильтров — выбранный,
+    # с фильтрами — агрегаты по строкам, отобранным битовыми картами
+    def make_engine():
+        if not filter_state:
+            return engine
+        # Только период: движок читает агрегаты или части нужных дней
+        if list(filter_state) == ['Дата']:
+            return engine.between(*filter_state['Дата'])
+        rows = index.rows(filter_state)
+        return PandasEngine(filters.filtered_rollup(dataset.data, rows))
+
+    # С фильтрами, кроме периода, результат не зависит от выбранного движка
+    source = 'фильтры' if set(filter_state) - {'Дата'} else engine.name
+    result_cache = load_result_cache()
+    result_cache.drop_stale(version)
+    # Результаты ночного прогона precompute.py совпадают с запросами pandas
+    for query, result in (dataset.results or {}).items():
+        result_cache.add(cache_key(version, 'pandas', {}, query), result)
+    context = QueryContext(result_cache, version, source, filter_state,
+                           make_engine)
+    figure_cache = load_figure_cache()
 
     # Заголовок
     st.title('Анализ брошенных корзин')
 
-    # Основные метрики
+    # Основные метрики выводятся сразу, до графиков
     col1, col2, col3 = st.columns(3)
 
-    total_amount = df['Сумма заказа'].sum()
-    total_orders = len(df)
-    avg_check = total_amount / total_orders
+    total_amount, total_orders, avg_check = context.get('kpis')
 
     with col1:
         st.metric('Общая сумма потерь', format_number(total_amount))
@@ -48,125 +134,201 @@ try:
     with col3:
         st.metric('Средний чек', format_number(avg_check))
 
-    # Топ-5 магазинов
-    st.header('Топ-5 магазинов')
-
-    # Агрегация данных по магазинам
-    store_stats = df.groupby('Магазин').agg({
-        'Сумма заказа': 'sum',
-        'Магазин': 'count'
-    }).rename(columns={
-        'Магазин': 'Количество корзин',
-        'Сумма заказа': 'Сумма заказов'
-    }).reset_index()
-
-    store_stats['Средний чек'] = store_stats['Сумма заказов'] / store_stats['Количество корзин']
-    top_5_stores = store_stats.nlargest(5, 'Сумма заказов')
-
-    # График топ-5 магазинов
-    fig1 = go.Figure()
-
-    # Добавляем столбцы для суммы заказов
-    fig1.add_trace(go.Bar(
-        x=top_5_stores['Магазин'],
-        y=top_5_stores['Сумма заказов'],
-        name='Сумма заказов',
-        marker_color='#8884d8'
-    ))
-
-    # Добавляем столбцы для количества корзин
-    fig1.add_trace(go.Bar(
-        x=top_5_stores['Магазин'],
-        y=top_5_stores['Количество корзин'],
-        name='Количество корзин',
-        marker_color='#82ca9d',
-        yaxis='y2'
-    ))
-
-    # Настройка макета
-    fig1.update_layout(
-        title='Топ-5 магазинов: сумма заказов и количество корзин',
-        yaxis=dict(
-            title='Сумма заказов',
-            title_font=dict(color='#8884d8'),
-            tickfont=dict(color='#8884d8')
-        ),
-        yaxis2=dict(
-            title='Количество корзин',
-            title_font=dict(color='#82ca9d'),
-            tickfont=dict(color='#82ca9d'),
-            overlaying='y',
-            side='right'
-        ),
-        barmode='group',
-        height=600
+    # Уникальные покупатели и заказы: оценка по эскизам (день, магазин)
+    # или точный подсчет по строкам, если он включен и выборка небольшая,
+    # либо если фильтры не сводятся к периоду и магазинам
+    def count_distinct():
+        rows = None
+        if exact_distinct or set(filter_state) - {'Дата', 'Магазин'}:
+            rows = index.rows(filter_state)
+        if rows is not None and (len(rows) <= hll.EXACT_LIMIT
+                                 or set(filter_state) - {'Дата', 'Магазин'}):
+            return dict(hll.exact_counts(dataset.data, rows), exact=True)
+        start, end = filter_state.get('Дата', (None, None))
+        counts = dataset.sketches.estimate(start, end, filter_state.get('Магазин'))
+        return dict(counts, exact=False)
+
+    distinct = context.get(
+        'distinct_exact' if exact_distinct else 'distinct', count_distinct
     )
+    error = hll.relative_error()
+    col1, col2, col3 = st.columns(3)
+    for col, label, name in ((col1, 'Покупатели', 'customers'),
+                             (col2, 'Заказы', 'orders')):
+        with col:
+            if distinct['exact']:
+                st.metric(label, f'{distinct[name]:,}')
+            else:
+                st.metric(label, f'≈{distinct[name]:,}')
+                st.caption(f'±{error:.1%} (95%: ±{2 * error:.1%}), HyperLogLog')
+
+    # Разделы: считается и строится только открытый
+    section = st.radio(
+        'Раздел', ['Топ-5 магазинов', 'Средний чек', 'Динамика по дням',
+                   'Воронка статусов', 'Возврат корзин', 'Когорты'],
+        horizontal=True, label_visibility='collapsed'
+    )
+
+    if section == 'Топ-5 магазинов':
+        st.header('Топ-5 магазинов')
+
+        # Агрегация данных по магазинам
+        top_5_stores = context.get('store_stats').nlargest(5, 'Сумма заказов')
+
+        # График топ-5 магазинов
+        fig1 = charts.cached_figure(figure_cache, 'top_stores', top_5_stores)
+        with instrument.stage('plotly_chart:top_stores'):
+            st.plotly_chart(fig1, use_container_width=True)
+
+    elif section == 'Средний чек':
+        st.header('Средний чек')
+
+        # Средний чек по тем же топ-5 магазинам
+        top_5_stores = context.get('store_stats').nlargest(5, 'Сумма заказов')
+
+        # График среднего чека по магазинам
+        fig2 = charts.cached_figure(figure_cache, 'avg_check', top_5_stores)
+        with instrument.stage('plotly_chart:avg_check'):
+            st.plotly_chart(fig2, use_container_width=True)
+
+    elif section == 'Динамика по дням':
+        st.header('Динамика по дням')
+
+        # Агрегация данных по дням
+        daily_stats = context.get('daily_stats')
+
+        # Длинный ряд: выбор интервала (детализация пересчитывается на сервере)
+        # и прореживание до ширины графика
+        total_points = len(daily_stats)
+        if total_points > CHART_WIDTH:
+            days = daily_stats['Дата'].dt.date
+            zoom = st.slider('Интервал', min_value=days.iloc[0],
+                             max_value=days.iloc[-1],
+                             value=(days.iloc[0], days.iloc[-1]))
+            daily_stats = daily_stats[(days >= zoom[0]) & (days <= zoom[1])]
+            with instrument.stage('downsample'):
+                daily_stats = downsample(daily_stats, 'Дата',
+                                         ['Сумма заказов', 'Количество корзин'])
+            st.caption(f'Показано точек: {len(daily_stats):,} из {total_points:,}')
+
+        # График динамики по дням
+        fig3 = charts.cached_figure(figure_cache, 'daily', daily_stats)
+        with instrument.stage('plotly_chart:daily'):
+            st.plotly_chart(fig3, use_container_width=True)
+
+    elif section == 'Воронка статусов':
+        st.header('Воронка статусов')
+
+        # Этапы заказов по истории статусов (день, магазин) для выбранных строк
+        stages = context.get('funnel', lambda: funnel.order_stages(
+            dataset.data, index.rows(filter_state) if filter_state else None
+        ))
+        summary = funnel.funnel(stages)
+
+        fig4 = charts.cached_figure(figure_cache, 'funnel', summary)
+        with instrument.stage('plotly_chart:funnel'):
+            st.plotly_chart(fig4, use_container_width=True)
+        st.dataframe(summary, hide_index=True, column_config={
+            'Конверсия в следующий': st.column_config.NumberColumn(format='percent'),
+            'Доля брошенных': st.column_config.NumberColumn(format='percent'),
+        })
+
+        # Конверсия между этапами по магазинам и доля брошенных по дням
+        by_store = funnel.rates_by(stages, 'Магазин') \
+            .sort_values('Заказы', ascending=False)
+        st.dataframe(by_store, hide_index=True, column_config={
+            col: st.column_config.NumberColumn(format='percent')
+            for col in by_store.columns[2:]
+        })
+        fig5 = charts.cached_figure(figure_cache, 'abandonment',
+                                    funnel.rates_by(stages, 'Дата'))
+        with instrument.stage('plotly_chart:abandonment'):
+            st.plotly_chart(fig5, use_container_width=True)
+
+    elif section == 'Возврат корзин':
+        st.header('Возврат корзин')
+
+        # Брошенная корзина возвращена, если тот же покупатель выполнил
+        # заказ в течение окна после нее
+        days = st.slider('Окно возврата, дней', min_value=1, max_value=60,
+                         value=recovery.RECOVERY_DAYS)
+        returns = context.get(f'recovery_{days}', lambda: recovery.recovery_table(
+            dataset.data, index.rows(filter_state) if filter_state else None,
+            days
+        ))
+        summary = recovery.totals(returns)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric('Потери брошенных корзин',
+                      format_number(summary['Сумма потерь']))
+            st.caption(f'Корзин: {summary["Брошено корзин"]:,}')
+        with col2:
+            st.metric('Возвращено', format_number(summary['Возвращенная сумма']))
+            st.caption(f'Корзин: {summary["Возвращено корзин"]:,} · '
+                       f'{summary["Доля возврата"]:.1%} потерь')
+        with col3:
+            st.metric('Чистые потери', format_number(summary['Чистые потери']))
+
+        # Возврат по магазинам и потери по дням
+        by_store = recovery.recovery_by(returns, 'Магазин') \
+            .sort_values('Чистые потери', ascending=False)
+        st.dataframe(by_store, hide_index=True, column_config={
+            'Доля возврата': st.column_config.NumberColumn(format='percent'),
+        })
+        fig6 = charts.cached_figure(figure_cache, 'recovery',
+                                    recovery.recovery_by(returns, 'Дата'))
+        with instrument.stage('plotly_chart:recovery'):
+            st.plotly_chart(fig6, use_container_width=True)
+
+    else:
+        st.header('Когорты покупателей')
+
+        # Покупатели по неделе первого заказа; матрицы считаются один раз
+        # на версию данных и состояние фильтров
+        tables = context.get('cohorts', lambda: cohorts.cohort_tables(
+            dataset.data, index.rows(filter_state) if filter_state else None
+        ))
+        kind = st.radio('Показатель', ['Повторные заказы', 'Повторные брошенные'],
+                        horizontal=True)
+        chart, table = ('cohort_orders', tables['orders']) \
+            if kind == 'Повторные заказы' \
+            else ('cohort_abandoned', tables['abandoned'])
+        st.caption(f'Доля покупателей когорты с заказом через 1–{cohorts.MAX_WEEKS} '
+                   f'недель после первого; когорт: {len(table):,}, '
+                   f'покупателей: {table["Покупатели"].sum():,}')
+
+        fig7 = charts.cached_figure(figure_cache, chart, table)
+        with instrument.stage(f'plotly_chart:{chart}'):
+            st.plotly_chart(fig7, use_container_width=True)
 
-    st.plotly_chart(fig1, use_container_width=True)
+    if dataset.as_of:
+        st.sidebar.caption(f'Данные на {dataset.as_of:%d.%m.%Y %H:%M}')
+    if worker.last_error:
+        st.sidebar.warning(f'Не удалось обновить данные: {worker.last_error}')
 
-    # График среднего чека по магазинам
-    fig2 = px.bar(
-        top_5_stores,
-        x='Магазин',
-        y='Средний чек',
-        title='Средний чек по магазинам',
-        height=400
+    cache_stats = result_cache.stats()
+    st.sidebar.caption(
+        f'Время запросов ({source}): {context.elapsed * 1000:.1f} мс · '
+        f'кэш: {cache_stats["hits"]} попаданий, {cache_stats["misses"]} промахов'
     )
-    fig2.update_traces(marker_color='#ffc658')
-    st.plotly_chart(fig2, use_container_width=True)
-
-    # График по дням
-    st.header('Динамика по дням')
-
-    # Агрегация данных по дням
-    daily_stats = df.groupby('Дата').agg({
-        'Сумма заказа': 'sum',
-        'Магазин': 'count'
-    }).rename(columns={
-        'Магазин': 'Количество корзин',
-        'Сумма заказа': 'Сумма заказов'
-    }).reset_index()
-
-    # График динамики по дням
-    fig3 = go.Figure()
-
-    # Добавляем линию для суммы заказов
-    fig3.add_trace(go.Scatter(
-        x=daily_stats['Дата'],
-        y=daily_stats['Сумма заказов'],
-        name='Сумма заказов',
-        line=dict(color='#8884d8')
-    ))
-
-    # Добавляем линию для количества корзин
-    fig3.add_trace(go.Scatter(
-        x=daily_stats['Дата'],
-        y=daily_stats['Количество корзин'],
-        name='Количество корзин',
-        line=dict(color='#82ca9d'),
-        yaxis='y2'
-    ))
-
-    # Настройка макета
-    fig3.update_layout(
-        title='Динамика брошенных корзин по дням',
-        yaxis=dict(
-            title='Сумма заказов',
-            title_font=dict(color='#8884d8'),
-            tickfont=dict(color='#8884d8')
-        ),
-        yaxis2=dict(
-            title='Количество корзин',
-            title_font=dict(color='#82ca9d'),
-            tickfont=dict(color='#82ca9d'),
-            overlaying='y',
-            side='right'
-        ),
-        height=500
+    figure_stats = figure_cache.stats()
+    st.sidebar.caption(
+        f'Кэш графиков: {figure_stats["hits"]} попаданий, '
+        f'{figure_stats["misses"]} промахов'
     )
 
-    st.plotly_chart(fig3, use_container_width=True)
+    # Панель замеров: только при включенных замерах
+    profile = instrument.finish()
+    if profile is not None:
+        with st.sidebar.expander('Замеры'):
+            st.caption(f'Запуск страницы: {profile.to_dict()["seconds"] * 1000:.1f} мс')
+            st.dataframe(profile.stages, hide_index=True)
+            if worker.last_profile is not None:
+                st.caption('Последнее обновление данных')
+                st.dataframe(worker.last_profile.stages, hide_index=True)
 
 except Exception as e:
+    instrument.finish()
     st.error(f'Произошла ошибка: {str(e)}')
     st.write('Детали ошибки:', e)
\ No newline at end of file
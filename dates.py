@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Формат выгрузок: 'dd.mm.YYYY HH:MM:SS' (19 байт ASCII)
+TIMESTAMP_WIDTH = 19
+
+# Окно доставки: 'dd.mm.YYYY HH:MM - HH:MM' или просто 'dd.mm.YYYY HH:MM'
+WINDOW_WIDTH = 24
+
+# Номер дня строк без разбираемой даты
+NO_DAY = np.iinfo(np.int32).min
+
+# Число дней в месяцах невисокосного года
+_MONTH_DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+# Количество дней от 1970-01-01 по году, месяцу и дню (алгоритм days_from_civil)
+def days_from_civil(year, month, day):
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    yoe = year - era * 400
+    mp = (month + 9) % 12
+    doy = (153 * mp + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+# Строки -> матрица байт (n, width) прямо из буфера Arrow; строки другой длины
+# или с не-ASCII символами заменяются на '?' и дают невалидную дату
+def _bytes(values, width):
+    array = pa.array(values, type=pa.string(), from_pandas=True)
+    array = pc.utf8_slice_codeunits(
+        pc.utf8_rpad(array, width=width, padding=' '), 0, width
+    )
+    array = pc.if_else(pc.equal(pc.binary_length(array), width),
+                       array, pa.scalar('?' * width))
+    fixed = array.cast(pa.binary(width))
+    start = fixed.offset * width
+    return np.frombuffer(fixed.buffers()[1], dtype=np.uint8)[
+        start:start + len(fixed) * width
+    ].reshape(len(fixed), width)
+
+
+def _number(raw, start, length):
+    value = np.zeros(len(raw), dtype=np.int64)
+    for i in range(start, start + length):
+        value = value * 10 + raw[:, i] - 48
+    return value
+
+
+# Число дней в месяце с учетом високосного года (month — 1..12)
+def days_in_month(year, month):
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    return _MONTH_DAYS[np.clip(month, 1, 12) - 1] + ((month == 2) & leap)
+
+
+# Все байты на позициях — цифры (для uint8 вычитание '0' переполняется у нецифр)
+def _valid(raw, positions):
+    return np.logical_and.reduce([raw[:, i] - 48 <= 9 for i in positions])
+
+
+# Дни от эпохи и секунды от начала дня для префикса 'dd.mm.YYYY HH:MM'
+def _parse_prefix(raw):
+    day = _number(raw, 0, 2)
+    month = _number(raw, 3, 2)
+    year = _number(raw, 6, 4)
+    seconds = _number(raw, 11, 2) * 3600 + _number(raw, 14, 2) * 60
+    valid = _valid(raw, [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15]) \
+        & (month >= 1) & (month <= 12) & (day >= 1) \
+        & (day <= days_in_month(year, month))
+    return days_from_civil(year, month, day), seconds, valid
+
+
+def _to_datetime(days, seconds, valid):
+    result = (days * 86400 + seconds).astype('datetime64[s]')
+    result[~valid] = np.datetime64('NaT')
+    return result
+
+
+def _uniques(values):
+    # Повторяющиеся значения разбираются один раз
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object),
+                                  use_na_sentinel=True)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def _expand(codes, parsed, fill):
+    result = np.full(len(codes), fill, dtype=parsed.dtype)
+    present = codes >= 0
+    result[present] = parsed[codes[present]]
+    return result
+
+
+# 'Дата статуса' -> (datetime64[s], номер дня int32)
+def parse_timestamps(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        timestamps = np.asarray(values, dtype='datetime64[s]')
+    else:
+        codes, uniques = _uniques(values)
+        raw = _bytes(uniques, TIMESTAMP_WIDTH)
+        days, seconds, valid = _parse_prefix(raw)
+        seconds = seconds + _number(raw, 17, 2)
+        valid &= _valid(raw, [17, 18])
+        parsed = _to_datetime(days, seconds, valid)
+        timestamps = _expand(codes, parsed, np.datetime64('NaT'))
+
+    day_numbers = timestamps.astype('datetime64[D]').astype(np.int64)
+    day_numbers[np.isnat(timestamps)] = NO_DAY
+    return timestamps, day_numbers.astype(np.int32)
+
+
+# 'Время доставки' -> (начало, конец) окна в datetime64[s]
+def parse_windows(values):
+    codes, uniques = _uniques(values)
+    raw = _bytes(uniques, WINDOW_WIDTH)
+    days, start, valid = _parse_prefix(raw)
+
+    # Окно без конца ('08.01.2025 18:01') считается точкой
+    has_end = _valid(raw, [19, 20, 22, 23])
+    end = np.where(has_end,
+                   _number(raw, 19, 2) * 3600 + _number(raw, 22, 2) * 60,
+                   start)
+    # Окно через полночь заканчивается на следующий день
+    end = end + np.where(end < start, 86400, 0)
+
+    nat = np.datetime64('NaT')
+    return (_expand(codes, _to_datetime(days, start, valid), nat),
+            _expand(codes, _to_datetime(days, end, valid), nat))
+
+
+# Номер дня -> дата (NO_DAY -> NaT)
+def day_to_date(days):
+    days = np.asarray(days, dtype='int64')
+    dates = days.astype('datetime64[D]')
+    dates[days == NO_DAY] = np.datetime64('NaT')
+    return dates
@@ -0,0 +1,79 @@
+import numpy as np
+
+# Ширина графика в точках: больше точек на экране все равно не различить
+CHART_WIDTH = 1200
+
+# Метод прореживания по умолчанию: 'lttb' или 'minmax'
+METHOD = 'lttb'
+
+
+# Значения оси X как числа (даты — в наносекундах)
+def _numeric(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype('int64').astype('float64')
+    return values.astype('float64')
+
+
+# Largest-Triangle-Three-Buckets: из каждой корзины берется точка,
+# образующая наибольший треугольник с уже выбранной точкой и средним
+# следующей корзины. Возвращает индексы выбранных точек
+def lttb(x, y, threshold):
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = _numeric(x)
+    y = np.nan_to_num(np.asarray(y, dtype='float64'))
+
+    # Первая и последняя точки всегда остаются, между ними threshold - 2 корзины
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        cx = x[next_start:next_end].mean()
+        cy = y[next_start:next_end].mean()
+
+        area = np.abs((x[a] - cx) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (cy - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+# Минимум и максимум каждой корзины: сохраняет все выбросы ряда
+def minmax(y, buckets):
+    n = len(y)
+    if buckets * 2 >= n or buckets < 1:
+        return np.arange(n)
+    y = np.nan_to_num(np.asarray(y, dtype='float64'))
+
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    selected = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        chunk = y[start:end]
+        selected += [start + int(np.argmin(chunk)), start + int(np.argmax(chunk))]
+    return np.unique(selected)
+
+
+# Прореживание кадра до ширины графика: точки выбираются по каждому ряду
+# (ширина делится между рядами), строки объединяются, чтобы ряды остались
+# на общей оси X
+def downsample(df, x, columns, points=CHART_WIDTH, method=METHOD):
+    if len(df) <= points:
+        return df
+    per_series = max(points // len(columns), 3)
+    keep = set()
+    for col in columns:
+        if method == 'minmax':
+            keep.update(minmax(df[col].to_numpy(), per_series // 2).tolist())
+        else:
+            keep.update(lttb(df[x].to_numpy(), df[col].to_numpy(),
+                             per_series).tolist())
+    return df.iloc[sorted(keep)]
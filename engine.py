@@ -0,0 +1,122 @@
+import copy
+import os
+
+import rollup
+from store import STORE_DIR, parts_between, read_manifest
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Движок по умолчанию: pandas по агрегатам или DuckDB по сырым строкам
+DEFAULT_ENGINE = os.environ.get('DASH_ENGINE', 'pandas')
+
+# Пустое представление, пока в хранилище нет ни одной части
+EMPTY_ORDERS = '''
+    SELECT NULL::VARCHAR AS "Дата статуса", NULL::VARCHAR AS "Магазин",
+           NULL::DOUBLE AS "Сумма заказа"
+    WHERE false
+'''
+
+KPIS_SQL = '''
+    SELECT coalesce(sum("Сумма заказа"), 0) AS total_amount,
+           count(*) AS total_orders
+    FROM {orders}
+'''
+
+STORE_STATS_SQL = '''
+    SELECT "Магазин",
+           sum("Сумма заказа") AS "Сумма заказов",
+           count(*) AS "Количество корзин",
+           sum("Сумма заказа") / count(*) AS "Средний чек"
+    FROM {orders}
+    WHERE "Магазин" IS NOT NULL
+    GROUP BY "Магазин"
+'''
+
+DAILY_STATS_SQL = '''
+    SELECT CAST(try_strptime("Дата статуса", '%d.%m.%Y %H:%M:%S') AS DATE) AS "Дата",
+           sum("Сумма заказа") AS "Сумма заказов",
+           count(*) AS "Количество корзин",
+           sum("Сумма заказа") / count(*) AS "Средний чек"
+    FROM {orders}
+    WHERE try_strptime("Дата статуса", '%d.%m.%Y %H:%M:%S') IS NOT NULL
+    GROUP BY 1
+    ORDER BY 1
+'''
+
+
+# Доступные движки (DuckDB — опциональная зависимость)
+def available_engines():
+    return ['pandas', 'duckdb'] if duckdb is not None else ['pandas']
+
+
+# Запросы дашборда через агрегаты, поддерживаемые при загрузке
+class PandasEngine:
+    name = 'pandas'
+
+    def __init__(self, agg):
+        self.agg = agg
+
+    def kpis(self):
+        return rollup.totals(self.agg)
+
+    def store_stats(self):
+        return rollup.store_stats(self.agg)
+
+    def daily_stats(self):
+        return rollup.daily_stats(self.agg)
+
+    # Те же запросы за период: только агрегаты нужных дней
+    def between(self, start, end):
+        return PandasEngine(rollup.between(self.agg, start, end))
+
+
+# Те же запросы на SQL: DuckDB параллельно сканирует части хранилища на диске
+class DuckDBEngine:
+    name = 'duckdb'
+
+    def __init__(self, store_dir=STORE_DIR, manifest=None, threads=None):
+        if duckdb is None:
+            raise RuntimeError('DuckDB не установлен: pip install duckdb')
+        self.store_dir = store_dir
+        self.manifest = manifest or read_manifest(store_dir)
+
+        self.con = duckdb.connect()
+        if threads:
+            self.con.execute(f'SET threads = {int(threads)}')
+        self.con.execute(f'CREATE VIEW orders AS {self._source()}')
+        self.orders = 'orders'
+
+    # Источник строк: части хранилища (все или только дни периода)
+    def _source(self, start=None, end=None):
+        parts = [os.path.join(self.store_dir, 'orders', part)
+                 for part in parts_between(self.manifest, start, end)]
+        if not parts:
+            return EMPTY_ORDERS
+        return f'SELECT * FROM read_parquet({parts!r}, union_by_name = true)'
+
+    # Те же запросы за период: читаются только части дней периода
+    def between(self, start, end):
+        engine = copy.copy(self)
+        engine.orders = f'({self._source(start, end)})'
+        return engine
+
+    # Отдельный курсор на запрос: соединение делится между сессиями
+    def _query(self, sql):
+        return self.con.cursor().execute(sql.format(orders=self.orders)).df()
+
+    def kpis(self):
+        row = self._query(KPIS_SQL).iloc[0]
+        total_amount, total_orders = row['total_amount'], int(row['total_orders'])
+        avg_check = total_amount / total_orders if total_orders else 0
+        return total_amount, total_orders, avg_check
+
+    def store_stats(self):
+        return self._query(STORE_STATS_SQL)
+
+    def daily_stats(self):
+        stats = self._query(DAILY_STATS_SQL)
+        stats['Дата'] = stats['Дата'].astype('datetime64[s]')
+        return stats
@@ -0,0 +1,130 @@
+import numpy as np
+
+import instrument
+import kernel
+import rollup
+from dates import NO_DAY, day_to_date
+
+# Колонки фильтров боковой панели (кроме диапазона дат)
+FILTER_COLUMNS = ['Магазин', 'city', 'Маркетплейс', 'group', 'Статус заказа']
+
+# Заголовки фильтров
+LABELS = {
+    'Магазин': 'Магазин',
+    'city': 'Город',
+    'Маркетплейс': 'Маркетплейс',
+    'group': 'Группа',
+    'Статус заказа': 'Статус заказа',
+}
+
+
+# Номера дней границ периода (datetime.date)
+def _day_numbers(start, end):
+    return (int(day) for day in
+            np.array([start, end], dtype='datetime64[D]').astype('int64'))
+
+
+# Битовые карты строк по значениям колонок фильтров: по одной упакованной
+# карте (np.packbits, бит на строку) на значение. Сочетание фильтров —
+# ИЛИ внутри колонки и И между колонками, без повторного сканирования строк
+class BitmapIndex:
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        self.size = len(df)
+        self.bitmaps = {}
+        for col in columns:
+            if col not in df:
+                continue
+            values = df[col].astype('category')
+            codes = values.cat.codes.to_numpy()
+            self.bitmaps[col] = {
+                value: np.packbits(codes == code)
+                for code, value in enumerate(values.cat.categories)
+            }
+
+        # Даты — диапазон, а не набор значений: сравнение по номеру дня
+        self.days = df['Дата'].to_numpy() if 'Дата' in df else None
+        known = self.days[self.days != NO_DAY] if self.days is not None else []
+        self.day_range = (int(known.min()), int(known.max())) if len(known) else None
+
+        # Снимок собран из частей по дням: строки с датой идут по порядку дней,
+        # строки без даты — в конце. Тогда период — непрерывный отрезок строк,
+        # и остальные дни не просматриваются
+        self.ordered_days = None
+        if self.days is not None:
+            dated = self.days[:len(known)]
+            if (dated != NO_DAY).all() and (dated[1:] >= dated[:-1]).all():
+                self.ordered_days = dated
+
+    # Значения колонки для выбора в фильтре
+    def options(self, col):
+        return sorted(self.bitmaps.get(col, {}), key=str)
+
+    # Диапазон дат данных (datetime.date) или None
+    def date_range(self):
+        if self.day_range is None:
+            return None
+        first, last = day_to_date(self.day_range).tolist()
+        return first, last
+
+    # Отрезок строк [lo, hi), в котором могут быть выбранные строки
+    def _row_range(self, state):
+        if 'Дата' not in state or self.ordered_days is None:
+            return 0, self.size
+        start, end = _day_numbers(*state['Дата'])
+        return (int(np.searchsorted(self.ordered_days, start, 'left')),
+                int(np.searchsorted(self.ordered_days, end, 'right')))
+
+    # Номера строк по состоянию фильтров: ИЛИ карт внутри колонки,
+    # И между колонками, только в пределах отрезка периода
+    def rows(self, state):
+        with instrument.stage('filter_mask'):
+            return self._rows(state)
+
+    def _rows(self, state):
+        lo, hi = self._row_range(state)
+        byte_lo, byte_hi = lo // 8, (hi + 7) // 8
+        bitmap = None
+        for col, values in state.items():
+            if col == 'Дата':
+                if self.ordered_days is not None:
+                    continue
+                start, end = _day_numbers(*values)
+                selected = np.packbits((self.days >= start) & (self.days <= end))
+            else:
+                column = self.bitmaps.get(col, {})
+                selected = np.zeros(byte_hi - byte_lo, dtype=np.uint8)
+                for value in values:
+                    if value in column:
+                        selected |= column[value][byte_lo:byte_hi]
+            bitmap = selected if bitmap is None else bitmap & selected
+
+        if bitmap is None:
+            return np.arange(lo, hi)
+        base = byte_lo * 8
+        bits = np.unpackbits(bitmap, count=min(byte_hi * 8, self.size) - base)
+        rows = np.flatnonzero(bits) + base
+        return rows[(rows >= lo) & (rows < hi)]
+
+
+# Состояние фильтров без пустых выборов и без диапазона на все данные,
+# в одном порядке колонок — одинаковый выбор дает одинаковое состояние
+def normalize(index, date_range=None, selected=None):
+    state = {}
+    if date_range and len(date_range) == 2 and tuple(date_range) != index.date_range():
+        state['Дата'] = tuple(date_range)
+    for col in FILTER_COLUMNS:
+        values = (selected or {}).get(col)
+        if values:
+            state[col] = tuple(sorted(values, key=str))
+    return state
+
+
+# Агрегаты в формате rollup по выбранным строкам: метрики и графики
+# считаются теми же функциями, что и без фильтров
+def filtered_rollup(df, rows):
+    rows = df[['Дата', 'Магазин', 'Сумма заказа']].take(rows)
+    # Группировка по номерам дней и кодам категорий, даты — уже по группам
+    with instrument.stage('groupby:filtered'):
+        agg = kernel.aggregate(rows, ['Дата', 'Магазин'], ['Сумма заказа'],
+                               rollup.COUNT)
+    return agg.assign(Дата=day_to_date(agg['Дата']).astype('datetime64[s]'))
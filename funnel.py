@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+import instrument
+import kernel
+from dates import day_to_date
+
+# Этапы заказа по порядку. Остальные статусы (например, отмена) этап
+# не продвигают: заказ брошен на последнем достигнутом этапе
+STAGES = ['Новый', 'Собирается', 'Собран', 'Доставляется', 'Выполнен']
+
+
+# Номер этапа каждого статуса (-1 — статус вне воронки)
+def stage_numbers(status):
+    status = pd.Series(status)
+    if isinstance(status.dtype, pd.CategoricalDtype):
+        lookup = pd.Index(STAGES).get_indexer(status.cat.categories)
+        # Код -1 (пропуск) попадает на добавленный последним -1
+        return np.r_[lookup, -1][status.cat.codes.to_numpy()]
+    return pd.Index(STAGES).get_indexer(status)
+
+
+# Заказы по событиям статусов: последовательности восстанавливаются одной
+# сортировкой событий по (заказ, время). Этап заказа — максимум по его
+# отрезку, время — первого и последнего события, день, магазин и колонки
+# columns — по первому событию
+def order_sequences(df, rows=None, columns=()):
+    events = df[['UUID заказа', 'Дата статуса', 'Статус заказа',
+                 'Магазин', 'Дата', *columns]]
+    if rows is not None:
+        events = events.take(rows)
+    events = events[events['UUID заказа'].notna().to_numpy()]
+
+    with instrument.stage('funnel:sequence'):
+        orders, _, _ = kernel.factorize(events['UUID заказа'])
+        times = events['Дата статуса'].to_numpy().astype('datetime64[s]')
+        order = np.lexsort((times.astype('int64'), orders))
+        orders = orders[order]
+        stage = stage_numbers(events['Статус заказа'])[order]
+
+        first = np.flatnonzero(np.diff(orders, prepend=-1))
+        last = np.r_[first, len(orders)][1:] - 1
+        reached = np.maximum.reduceat(stage, first) if len(first) \
+            else np.empty(0, dtype=stage.dtype)
+
+    # Заказ в выгрузке хотя бы создан: без статусов воронки (например,
+    # только отмена) он считается брошенным на первом этапе
+    start = order[first]
+    return pd.DataFrame({
+        'Дата': events['Дата'].to_numpy()[start],
+        'Магазин': events['Магазин'].take(start).reset_index(drop=True),
+        'Этап': np.maximum(reached, 0),
+        'Начало': times[start],
+        'Конец': times[order[last]],
+        **{col: events[col].take(start).reset_index(drop=True)
+           for col in columns},
+    })
+
+
+# Таблица воронки по (день, магазин): сколько заказов дошло до каждого
+# этапа. Счетчики аддитивны: брошенные на этапе — разность соседних колонок
+def order_stages(df, rows=None):
+    orders = order_sequences(df, rows)
+    table = orders[['Дата', 'Магазин']].assign(**{
+        name: (orders['Этап'] >= k).astype('int64')
+        for k, name in enumerate(STAGES)
+    })
+    with instrument.stage('groupby:funnel'):
+        table = kernel.aggregate(table, ['Дата', 'Магазин'], STAGES)
+    table = table.astype({name: 'int64' for name in STAGES})
+    return table.assign(Дата=day_to_date(table['Дата']).astype('datetime64[s]'))
+
+
+def _share(part, total):
+    return kernel.mean(part, total)
+
+
+# Воронка целиком: заказы на этапе, переход в следующий и брошенные
+def funnel(table):
+    reached = table[STAGES].sum().to_numpy()
+    following = np.r_[reached[1:], reached[-1]]
+    abandoned = reached - following
+    return pd.DataFrame({
+        'Этап': STAGES,
+        'Заказы': reached,
+        'Конверсия в следующий': np.r_[_share(following, reached)[:-1], np.nan],
+        'Брошено': abandoned,
+        'Доля брошенных': _share(abandoned, reached),
+    })
+
+
+# Конверсия между соседними этапами и доля брошенных по магазинам или дням
+def rates_by(table, column):
+    stats = kernel.aggregate(table, [column], STAGES)
+    stats = stats[stats[column].notna()].reset_index(drop=True)
+    rates = pd.DataFrame({column: stats[column],
+                          'Заказы': stats[STAGES[0]].astype('int64')})
+    for prev, name in zip(STAGES, STAGES[1:]):
+        rates[f'{prev} → {name}'] = _share(stats[name], stats[prev])
+    rates['Доля брошенных'] = 1 - _share(stats[STAGES[-1]], stats[STAGES[0]])
+    return rates
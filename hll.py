@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# HyperLogLog: 2**P регистров на эскиз, относительная ошибка ~1.04 / sqrt(2**P)
+P = 10
+M = 1 << P
+
+# Эскизы считаются по дню и магазину
+GRAIN = ['Дата', 'Магазин']
+
+# Уникальные значения, которые оцениваются эскизами
+COLUMNS = {'customers': 'UUID Покупателя', 'orders': 'UUID заказа'}
+
+
+# Точный подсчет включается для выборок не больше стольких строк
+EXACT_LIMIT = 200_000
+
+
+# Стандартная ошибка оценки (доля)
+def relative_error(p=P):
+    return 1.04 / np.sqrt(1 << p)
+
+
+# 64-битные хэши значений (пропуски не учитываются)
+def hash_values(values):
+    values = pd.Series(values).dropna()
+    return values.index.to_numpy(), pd.util.hash_pandas_object(
+        values.astype(str), index=False
+    ).to_numpy()
+
+
+# Число ведущих нулей 32-битных слов (через показатель float64 — точно)
+def _leading_zeros32(words):
+    return 32 - np.frexp(words.astype('float64'))[1]
+
+
+# Номер регистра и ранг (позиция первой единицы) каждого хэша
+def _register_rank(hashes):
+    index = (hashes >> np.uint64(64 - P)).astype(np.intp)
+    rest = hashes << np.uint64(P)
+    high = (rest >> np.uint64(32)).astype('uint32')
+    low = (rest & np.uint64(0xFFFFFFFF)).astype('uint32')
+    zeros = np.where(high > 0, _leading_zeros32(high), 32 + _leading_zeros32(low))
+    rank = np.minimum(zeros + 1, 64 - P + 1).astype('uint8')
+    return index, rank
+
+
+# Регистры эскизов по группам: матрица (число групп, M)
+def registers(hashes, groups, n_groups):
+    sketches = np.zeros((n_groups, M), dtype='uint8')
+    if len(hashes):
+        index, rank = _register_rank(hashes)
+        np.maximum.at(sketches, (groups, index), rank)
+    return sketches
+
+
+# Оценка числа уникальных значений по регистрам одного эскиза
+def estimate(sketch):
+    sketch = np.asarray(sketch, dtype='float64')
+    alpha = 0.7213 / (1 + 1.079 / M)
+    raw = alpha * M * M / np.sum(np.exp2(-sketch))
+    zeros = np.count_nonzero(sketch == 0)
+    # Малые множества: линейный подсчет по пустым регистрам
+    if raw <= 2.5 * M and zeros:
+        return M * np.log(M / zeros)
+    return raw
+
+
+# Номера групп ключей (пропуски — отдельная группа) и сами ключи
+def _factorize(keys):
+    grouped = keys.groupby(GRAIN, dropna=False, observed=True, sort=False)
+    return grouped.ngroup().to_numpy(), grouped.size().reset_index()[GRAIN]
+
+
+# Эскизы по сырым строкам заказов: ключи (день, магазин) и регистры
+def build(df, days):
+    keys = pd.DataFrame({'Дата': days, 'Магазин': df['Магазин'].to_numpy()})
+    codes, uniques = _factorize(keys)
+    sketches = {}
+    for name, col in COLUMNS.items():
+        if col not in df:
+            sketches[name] = np.zeros((len(uniques), M), dtype='uint8')
+            continue
+        rows, hashes = hash_values(df[col].reset_index(drop=True))
+        sketches[name] = registers(hashes, codes[rows], len(uniques))
+    return uniques, sketches
+
+
+# Слияние эскизов: регистры совпадающих ключей объединяются максимумом
+def merge(*parts):
+    parts = [(keys, sketches) for keys, sketches in parts if len(keys)]
+    if not parts:
+        return pd.DataFrame(columns=GRAIN), {name: np.zeros((0, M), 'uint8')
+                                            for name in COLUMNS}
+    keys = pd.concat([k for k, _ in parts], ignore_index=True)
+    codes, uniques = _factorize(keys)
+    merged = {}
+    for name in COLUMNS:
+        stacked = np.concatenate([s[name] for _, s in parts])
+        out = np.zeros((len(uniques), M), dtype='uint8')
+        np.maximum.at(out, codes, stacked)
+        merged[name] = out
+    # Упорядочение по дню: период — отрезок строк
+    order = np.argsort(uniques['Дата'].to_numpy(), kind='stable')
+    return uniques.take(order).reset_index(drop=True), \
+        {name: s[order] for name, s in merged.items()}
+
+
+# Эскизы в таблицу для Parquet: регистры — байтовые строки
+def to_frame(keys, sketches):
+    frame = keys.copy()
+    for name, s in sketches.items():
+        frame[name] = [row.tobytes() for row in s]
+    return frame
+
+
+def from_frame(frame):
+    keys = frame[GRAIN].reset_index(drop=True)
+    sketches = {
+        name: np.frombuffer(b''.join(frame[name]), dtype='uint8')
+        .reshape(len(frame), M).copy()
+        for name in COLUMNS
+    }
+    return keys, sketches
+
+
+# Оценка уникальных значений за период и по магазинам: регистры
+# подходящих эскизов объединяются максимумом
+class Sketches:
+    def __init__(self, keys, sketches):
+        self.days = keys['Дата'].to_numpy().astype('datetime64[D]')
+        self.stores = keys['Магазин'].to_numpy()
+        self.sketches = sketches
+
+    def estimate(self, start=None, end=None, stores=None):
+        lo, hi = 0, len(self.days)
+        if start is not None:
+            lo = np.searchsorted(self.days, np.datetime64(start, 'D'), 'left')
+        if end is not None:
+            hi = np.searchsorted(self.days, np.datetime64(end, 'D'), 'right')
+        selected = np.arange(lo, hi)
+        if stores:
+            selected = selected[np.isin(self.stores[lo:hi], list(stores))]
+        result = {}
+        for name, s in self.sketches.items():
+            if not len(selected):
+                result[name] = 0
+                continue
+            result[name] = int(round(estimate(np.max(s[selected], axis=0))))
+        return result
+
+
+# Точное число уникальных значений в выбранных строках снимка
+def exact_counts(df, rows):
+    take = pa.array(np.asarray(rows, dtype='int64'))
+    return {
+        name: pc.count_distinct(pa.array(df[col]).take(take)).as_py()
+        if col in df else 0
+        for name, col in COLUMNS.items()
+    }
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from xlsx_reader import conform, iter_chunks
+
+# Каталог для колоночных копий выгрузок
+CACHE_DIR = os.environ.get('DASH_CACHE_DIR', '.cache')
+
+# Выгрузки, которые конвертируются в Parquet
+SOURCES = ['orders.xlsx', 'products.xlsx', 'combined_report.xlsx']
+
+
+# Хэш содержимого файла (читается блоками, без загрузки целиком)
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Пути к Parquet-файлу и его метаданным для выгрузки
+def cache_paths(path, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return (os.path.join(cache_dir, f'{stem}.parquet'),
+            os.path.join(cache_dir, f'{stem}.json'))
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+# Проверка актуальности копии: сначала mtime и размер, при расхождении — хэш
+def is_fresh(path, cache_dir=CACHE_DIR):
+    parquet_path, meta_path = cache_paths(path, cache_dir)
+    meta = _read_meta(meta_path)
+    if meta is None or not os.path.exists(parquet_path):
+        return False
+
+    stat = os.stat(path)
+    if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+        return True
+
+    # Файл могли перезаписать тем же содержимым — тогда копия остается валидной
+    if meta['size'] == stat.st_size and meta['hash'] == file_hash(path):
+        meta['mtime_ns'] = stat.st_mtime_ns
+        _write_meta(meta_path, meta)
+        return True
+    return False
+
+
+# Приведение смешанных текстовых колонок к строковому типу для Parquet.
+# Пустые колонки остаются object: в Arrow они получают тип null
+def normalize(df):
+    for col in df.columns:
+        if df[col].dtype == object and df[col].notna().any():
+            df[col] = df[col].astype('string')
+    return df
+
+
+# Потоковая запись порций листа в один Parquet-файл; возвращает число строк.
+# Типы колонок от порции к порции только расширяются (xlsx_reader.KINDS);
+# если порция расширила тип, записанное переписывается пакетами под новые типы
+def write_chunks(chunks, path):
+    writer = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            chunk = normalize(chunk)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is not None and not table.schema.equals(writer.schema):
+                writer.close()
+                writer = _rewrite(path, chunk, table.schema)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    # Лист без заголовка — пустая таблица, как у read_xlsx
+    if writer is None:
+        pq.write_table(pa.table({}), path)
+    return rows
+
+
+def _rewrite(path, like, schema):
+    old_path = path + '.old'
+    os.replace(path, old_path)
+    writer = pq.ParquetWriter(path, schema)
+    for batch in pq.ParquetFile(old_path).iter_batches():
+        chunk = normalize(conform(batch.to_pandas(), like))
+        writer.write_table(pa.Table.from_pandas(chunk, schema=schema,
+                                                preserve_index=False))
+    os.remove(old_path)
+    return writer
+
+
+# Конвертация выгрузки Excel в типизированный Parquet: лист читается
+# порциями, и каждая порция сразу дописывается в файл
+def convert(path, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    parquet_path, meta_path = cache_paths(path, cache_dir)
+
+    stat = os.stat(path)
+    tmp_path = parquet_path + '.tmp'
+    rows = write_chunks(iter_chunks(path), tmp_path)
+    os.replace(tmp_path, parquet_path)
+
+    _write_meta(meta_path, {
+        'source': os.path.abspath(path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'hash': file_hash(path),
+        'rows': rows,
+    })
+    return parquet_path
+
+
+# Чтение выгрузки: из Parquet, если копия свежая, иначе с конвертацией
+def read_table(path, cache_dir=CACHE_DIR):
+    if not is_fresh(path, cache_dir):
+        convert(path, cache_dir)
+    return pd.read_parquet(cache_paths(path, cache_dir)[0])
+
+
+# Конвертация всех найденных выгрузок
+def ingest_all(sources=SOURCES, cache_dir=CACHE_DIR):
+    converted = []
+    for path in sources:
+        if os.path.exists(path) and not is_fresh(path, cache_dir):
+            convert(path, cache_dir)
+            converted.append(path)
+    return converted
+
+
+if __name__ == '__main__':
+    import star
+
+    for path in ingest_all():
+        print(f'{path} -> {cache_paths(path)[0]}')
+    # Звездная схема собирается при загрузке, страницы только читают ее
+    if all(os.path.exists(path) for path in (star.ORDERS, star.PRODUCTS)) \
+            and star.ensure():
+        print(f'Звездная схема -> {star.STAR_DIR}')
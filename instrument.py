@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Замеры включаются переменной окружения (для всех запусков)
+# или параметром ?debug=1 в адресе страницы (для одной сессии)
+ENABLED = os.environ.get('DASH_PROFILE') == '1'
+
+# Файл структурированного лога (JSON на строку); без него — stderr
+LOG_PATH = os.environ.get('DASH_PROFILE_LOG')
+
+logger = logging.getLogger('dash.profile')
+
+# Замер текущего потока: у каждой сессии Streamlit и у фонового обновления свой
+_local = threading.local()
+
+# Пустой контекст, когда замеры выключены: одна проверка на этап
+_NULL = nullcontext()
+
+
+def _rss():
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+# Замер одного прохода: этапы по порядку завершения, вложенные — с глубиной
+class Profile:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.stages = []
+        self.depth = 0
+
+    @contextmanager
+    def stage(self, name):
+        rss = _rss()
+        start = time.perf_counter()
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            record = {'stage': name, 'depth': self.depth,
+                      'seconds': round(time.perf_counter() - start, 6)}
+            if rss is not None:
+                record['rss_delta_mb'] = round((_rss() - rss) / 2**20, 3)
+            self.stages.append(record)
+
+    def to_dict(self):
+        return {
+            'run': self.name,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S',
+                                     time.localtime(self.started)),
+            'seconds': round(time.time() - self.started, 6),
+            'stages': self.stages,
+        }
+
+
+def _configure_logger():
+    if logger.handlers:
+        return
+    handler = logging.FileHandler(LOG_PATH, encoding='utf-8') if LOG_PATH \
+        else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+# Начало замера прохода в текущем потоке (None, если замеры выключены).
+# Проходы вкладываются: первое обновление данных идет внутри запуска страницы
+def start(name, enabled=ENABLED):
+    profile = Profile(name) if enabled else None
+    _stack().append(profile)
+    return profile
+
+
+def current():
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+# Завершение замера: запись в лог одной JSON-строкой
+def finish(log=True):
+    stack = _stack()
+    profile = stack.pop() if stack else None
+    if profile is not None and log:
+        _configure_logger()
+        logger.info(json.dumps(profile.to_dict(), ensure_ascii=False))
+    return profile
+
+
+# Замер этапа: with stage('name'): ...
+def stage(name):
+    profile = current()
+    if profile is None:
+        return _NULL
+    return profile.stage(name)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+# Плотная таблица групп (bincount по всем сочетаниям кодов) используется,
+# пока число сочетаний не больше стольких на строку; иначе — сортировка кодов
+DENSE_FACTOR = 4
+
+
+# Целочисленные коды значений колонки, их число и функция обратного
+# преобразования кодов в значения. Категории и целые числа уже закодированы —
+# строки заново не хэшируются; пропуски получают последний код
+def factorize(values):
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy().astype(np.int64)
+        n = len(values.cat.categories)
+        codes[codes < 0] = n
+        return codes, n + 1, lambda c: pd.Categorical.from_codes(
+            np.where(c < n, c, -1), dtype=values.dtype
+        )
+
+    if isinstance(values.dtype, np.dtype) and \
+            np.issubdtype(values.dtype, np.integer) and len(values):
+        array = values.to_numpy()
+        low, high = int(array.min()), int(array.max())
+        if high - low <= DENSE_FACTOR * len(array):
+            return array.astype(np.int64) - low, high - low + 1, \
+                lambda c: (c + low).astype(array.dtype)
+
+    # Уникальные значения упорядочиваются отдельно: сортировка внутри
+    # pd.factorize для строк в разы дороже самого хэширования
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    order = pd.Series(uniques).sort_values(na_position='last').index.to_numpy()
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[codes], len(uniques), uniques.take(order).take
+
+
+# Смешанный код строки по нескольким колонкам и число его значений.
+# Пока значений немного (DENSE_FACTOR), код сам служит номером группы:
+# суммы считаются bincount по плотной таблице, пустые группы отбрасываются
+# в конце. Иначе коды сжимаются сортировкой до встречающихся значений
+def group_codes(df, by):
+    levels = [factorize(df[col]) for col in by]
+    combined = np.zeros(len(df), dtype=np.int64)
+    size = 1
+    for codes, n, _ in levels:
+        combined = combined * max(n, 1) + codes
+        size *= max(n, 1)
+
+    groups = None
+    if size > max(DENSE_FACTOR * len(df), 1 << 16):
+        groups, combined = np.unique(combined, return_inverse=True)
+        size = len(groups)
+    return combined, size, groups, levels
+
+
+# Значения ключей групп: смешанный код раскладывается обратно по колонкам
+def _decode(groups, by, levels):
+    keys = {}
+    for col, (_, n, decode) in zip(reversed(by), reversed(levels)):
+        groups, codes = np.divmod(groups, max(n, 1))
+        keys[col] = decode(codes)
+    return {col: keys[col] for col in by}
+
+
+# Суммы мер и число строк по группам за один проход по кодам
+# (замена df.groupby(by)[sums].sum() и .size(), пропуски в мерах — 0)
+def aggregate(df, by, sums=(), count=None):
+    codes, size, groups, levels = group_codes(df, by)
+    counts = np.bincount(codes, minlength=size)
+    totals = {
+        col: np.bincount(codes, weights=pd.to_numeric(df[col]).to_numpy(
+            dtype='float64', na_value=0.0), minlength=size)
+        for col in sums
+    }
+    present = np.flatnonzero(counts)
+    if groups is None:
+        groups = present
+    else:
+        groups = groups[present]
+
+    result = pd.DataFrame(_decode(groups, by, levels))
+    for col in sums:
+        result[col] = totals[col][present]
+    if count:
+        result[count] = counts[present]
+    return result
+
+
+# Средние по группам: отношение сумм к числу строк
+def mean(sums, counts):
+    sums = np.asarray(sums, dtype='float64')
+    counts = np.asarray(counts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
@@ -0,0 +1,108 @@
+import os
+
+import streamlit as st
+
+import basket
+import instrument
+import star
+from result_cache import ResultCache, cache_key
+
+# Настройка страницы
+st.set_page_config(page_title='Состав брошенных корзин', layout='wide')
+
+# Строки корзин из звездной схемы (ключи заказов и товаров), одни на
+# процесс; схема пересобирается, только когда изменились выгрузки
+@st.cache_resource(max_entries=1)
+def load_lines(version):
+    star.ensure()
+    tables = star.read_star(['line_fact', 'product_dim', 'store_dim'])
+    return basket.prepare(tables['line_fact'], tables['product_dim'],
+                          tables['store_dim'])
+
+# Кэш результатов анализа по состоянию фильтров, общий для всех сессий
+@st.cache_resource
+def load_basket_cache():
+    return ResultCache()
+
+# Формат долей в таблицах
+PERCENT = st.column_config.NumberColumn(format='percent')
+
+try:
+    # Замеры этапов: DASH_PROFILE=1 или ?debug=1 в адресе страницы
+    instrument.start('basket', instrument.ENABLED
+                     or st.query_params.get('debug') == '1')
+
+    version = tuple(os.stat(path).st_mtime_ns
+                    for path in (star.ORDERS, star.PRODUCTS))
+    with instrument.stage('load'):
+        lines, names = load_lines(version)
+
+    # Фильтры: период, магазины, только невыполненные заказы и пороги
+    st.sidebar.header('Фильтры')
+    period = basket.period(lines)
+    if period:
+        period = st.sidebar.date_input('Период', value=period,
+                                       min_value=period[0],
+                                       max_value=period[1])
+    stores = st.sidebar.multiselect(
+        'Магазин', list(lines['Магазин'].cat.categories)
+    )
+    abandoned = st.sidebar.checkbox('Только невыполненные заказы', value=True)
+    min_support = st.sidebar.slider(
+        'Минимальная поддержка', min_value=0.001, max_value=0.2,
+        value=basket.MIN_SUPPORT, step=0.001, format='%.3f',
+        help='Доля корзин, в которых встречается набор'
+    )
+    min_confidence = st.sidebar.slider(
+        'Минимальное доверие', min_value=0.05, max_value=1.0,
+        value=basket.MIN_CONFIDENCE, step=0.05
+    )
+    filter_state = basket.normalize(lines, period, stores, abandoned)
+
+    # Наборы и правила считаются один раз на состояние фильтров и пороги
+    cache = load_basket_cache()
+    cache.drop_stale(version)
+    result = cache.get(
+        cache_key(version, 'basket', filter_state,
+                  (min_support, min_confidence)),
+        lambda: basket.analyze(basket.select(lines, filter_state), names,
+                               min_support, min_confidence)
+    )
+
+    st.title('Состав брошенных корзин')
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric('Корзины', f'{result["orders"]:,}')
+    with col2:
+        st.metric('Товары', f'{result["items"]:,}')
+    with col3:
+        st.metric('Частые наборы', f'{len(result["itemsets"]):,}')
+
+    st.header('Правила')
+    st.caption('Если в корзине есть товары слева, в ней же оказывается товар '
+               'справа; лифт больше 1 — чаще, чем случайно')
+    st.dataframe(result['rules'], hide_index=True, column_config={
+        'Поддержка': PERCENT, 'Доверие': PERCENT,
+        'Лифт': st.column_config.NumberColumn(format='%.2f'),
+    })
+
+    st.header('Частые наборы')
+    st.dataframe(result['itemsets'], hide_index=True,
+                 column_config={'Поддержка': PERCENT})
+
+    stats = cache.stats()
+    st.sidebar.caption(f'Кэш анализа: {stats["hits"]} попаданий, '
+                       f'{stats["misses"]} промахов')
+
+    # Панель замеров: только при включенных замерах
+    profile = instrument.finish()
+    if profile is not None:
+        with st.sidebar.expander('Замеры'):
+            st.caption(f'Запуск страницы: {profile.to_dict()["seconds"] * 1000:.1f} мс')
+            st.dataframe(profile.stages, hide_index=True)
+
+except Exception as e:
+    instrument.finish()
+    st.error(f'Произошла ошибка: {str(e)}')
+    st.write('Детали ошибки:', e)
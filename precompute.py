@@ -0,0 +1,129 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import rollup
+from engine import PandasEngine
+from shared import open_snapshot
+from store import STORE_DIR, export_paths, part_day, read_store, sync
+
+# Запросы дашборда, которые считаются заранее
+QUERIES = ['kpis', 'store_stats', 'top_5_stores', 'daily_stats']
+
+
+def results_dir(version, store_dir=STORE_DIR):
+    return os.path.join(store_dir, f'results-{version:05d}')
+
+
+# Месячные разделы хранилища: части по месяцу их дня; части строк без
+# даты и части прежней раскладки без разделов — отдельным разделом
+def month_partitions(manifest):
+    partitions = {}
+    for part in sorted(manifest['parts']):
+        day = part_day(part) if '/' in part else None
+        month = str(day.astype('datetime64[M]')) if day is not None else ''
+        partitions.setdefault(month, []).append(part)
+    return list(partitions.values())
+
+
+# Агрегаты одного раздела по его сырым строкам. Выполняется в отдельном
+# процессе; агрегаты те же, что поддерживаются при загрузке (rollup.build)
+def _partition_rollup(store_dir, parts):
+    return rollup.build(read_store(store_dir, {'parts': parts}))
+
+
+# Все результаты дашборда по версии хранилища: разделы по месяцам
+# агрегируются параллельно в пуле процессов, агрегаты сливаются, а запросы
+# считает тот же PandasEngine, что и дашборд, — результаты совпадают
+# с живыми под теми же ключами кэша
+def compute(manifest, store_dir=STORE_DIR, workers=None):
+    partitions = month_partitions(manifest)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(_partition_rollup,
+                                 [store_dir] * len(partitions), partitions))
+
+    agg = rollup.merge(*partials).sort_values('Дата', kind='stable') \
+        .reset_index(drop=True)
+    engine = PandasEngine(agg)
+    store_stats = engine.store_stats()
+    return {
+        'kpis': engine.kpis(),
+        'store_stats': store_stats,
+        'top_5_stores': store_stats.nlargest(5, 'Сумма заказов'),
+        'daily_stats': engine.daily_stats(),
+    }
+
+
+# Запись результатов рядом с хранилищем (атомарно: каталог переименовывается)
+def write_results(results, version, store_dir=STORE_DIR):
+    target = results_dir(version, store_dir)
+    tmp = f'{target}.{os.getpid()}.tmp'
+    os.makedirs(tmp, exist_ok=True)
+    total_amount, total_orders, avg_check = results['kpis']
+    with open(os.path.join(tmp, 'kpis.json'), 'w', encoding='utf-8') as f:
+        json.dump({'total_amount': float(total_amount),
+                   'total_orders': total_orders,
+                   'avg_check': float(avg_check)}, f)
+    for name in QUERIES[1:]:
+        results[name].to_parquet(os.path.join(tmp, f'{name}.parquet'),
+                                 index=False)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+
+    for old in glob.glob(os.path.join(store_dir, 'results-*')):
+        if old != target:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+# Готовые результаты версии или None, если их еще не посчитали
+def read_results(version, store_dir=STORE_DIR):
+    target = results_dir(version, store_dir)
+    try:
+        with open(os.path.join(target, 'kpis.json'), encoding='utf-8') as f:
+            kpis = json.load(f)
+    except (OSError, ValueError):
+        return None
+    results = {'kpis': (kpis['total_amount'], kpis['total_orders'],
+                        kpis['avg_check'])}
+    for name in QUERIES[1:]:
+        # Даты читаются в тех же единицах, что и агрегаты (store.read_rollup)
+        results[name] = pd.read_parquet(os.path.join(target, f'{name}.parquet'))
+    return results
+
+
+# Полный прогон без Streamlit: загрузка выгрузок, снимок и результаты
+def run(sources=None, store_dir=STORE_DIR, workers=None):
+    manifest = sync(sources, store_dir)
+    version = manifest['version']
+    # Снимок версии пишется здесь, а не при первом открытии дашборда
+    open_snapshot(store_dir, manifest)
+    results = compute(manifest, store_dir, workers)
+    write_results(results, version, store_dir)
+    return version, results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Расчет результатов дашборда заранее (например, из cron)'
+    )
+    parser.add_argument('exports', nargs='*',
+                        help='файлы выгрузок (по умолчанию — как у дашборда)')
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='число процессов (по умолчанию — по числу ядер)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    version, results = run(args.exports or export_paths(), args.store_dir,
+                           args.workers)
+    total_amount, total_orders, avg_check = results['kpis']
+    print(f'Версия {version}: {total_orders} корзин на {total_amount:,.0f} ₸, '
+          f'средний чек {avg_check:,.0f} ₸')
+    print(f'Результаты: {results_dir(version, args.store_dir)} '
+          f'({time.perf_counter() - start:.1f} с)')
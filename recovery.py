@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+import funnel
+import instrument
+import kernel
+from dates import day_to_date
+
+# Окно возврата по умолчанию: выполненный заказ того же покупателя
+# не позже стольких дней после брошенной корзины
+RECOVERY_DAYS = 7
+
+# Меры таблицы возврата, аддитивные по (день, магазин)
+COUNTS = ['Брошено корзин', 'Возвращено корзин']
+AMOUNTS = ['Сумма потерь', 'Возвращенная сумма', 'Чистые потери']
+
+
+# Брошенные корзины (не дошедшие до последнего этапа) и выполненный заказ
+# того же покупателя, начатый в окне после корзины. Поиск — as-of слияние
+# отсортированных по времени корзин и выполненных заказов по коду
+# покупателя, без декартова произведения. Один выполненный заказ
+# возвращает не больше одной корзины — последнюю перед ним
+def match(orders, days=RECOVERY_DAYS):
+    completed = orders['Этап'].to_numpy() == len(funnel.STAGES) - 1
+    customers, _, _ = kernel.factorize(orders['UUID Покупателя'])
+    known = orders['UUID Покупателя'].notna().to_numpy()
+    frame = pd.DataFrame({
+        'Покупатель': customers,
+        'Время': orders['Начало'],
+        'Сумма': pd.to_numeric(orders['Сумма заказа']).to_numpy(
+            dtype='float64', na_value=0.0),
+        'Номер': np.arange(len(orders)),
+    })
+    # Заказы без разбираемого времени первого статуса в слияние не идут;
+    # такие корзины остаются в потерях как не возвращенные
+    timed = frame['Время'].notna().to_numpy()
+    carts = frame[~completed & timed].sort_values('Время', kind='stable')
+    done = frame[completed & known & timed].sort_values('Время', kind='stable')
+
+    with instrument.stage('recovery:merge_asof'):
+        matched = pd.merge_asof(
+            carts, done, on='Время', by='Покупатель', direction='forward',
+            tolerance=pd.Timedelta(days=days), allow_exact_matches=False,
+            suffixes=('', ' возврата')
+        )
+    matched = pd.concat([matched, frame[~completed & ~timed]],
+                        ignore_index=True)
+    recovered = matched['Номер возврата'].notna() \
+        & ~matched['Номер возврата'].duplicated(keep='last')
+    return matched.assign(Возвращена=recovered.to_numpy())
+
+
+# Таблица возврата по дню и магазину брошенной корзины: потери, сколько
+# из них вернулось выполненным заказом и чистые потери
+def recovery_table(df, rows=None, days=RECOVERY_DAYS):
+    orders = funnel.order_sequences(df, rows, ['UUID Покупателя',
+                                               'Сумма заказа'])
+    matched = match(orders, days)
+    recovered = matched['Возвращена'].to_numpy()
+    amount = matched['Сумма'].to_numpy()
+    returned = np.where(
+        recovered,
+        np.minimum(amount, matched['Сумма возврата'].fillna(0).to_numpy()),
+        0.0
+    )
+    carts = orders.take(matched['Номер'].to_numpy())
+    table = pd.DataFrame({
+        'Дата': carts['Дата'].to_numpy(),
+        'Магазин': carts['Магазин'].reset_index(drop=True),
+        'Брошено корзин': 1,
+        'Возвращено корзин': recovered.astype('int64'),
+        'Сумма потерь': amount,
+        'Возвращенная сумма': returned,
+        'Чистые потери': amount - returned,
+    })
+    with instrument.stage('groupby:recovery'):
+        table = kernel.aggregate(table, ['Дата', 'Магазин'], COUNTS + AMOUNTS)
+    table = table.astype({col: 'int64' for col in COUNTS})
+    return table.assign(Дата=day_to_date(table['Дата']).astype('datetime64[s]'))
+
+
+# Итоги: суммы мер и доля возвращенных потерь
+def totals(table):
+    result = {col: table[col].sum() for col in COUNTS + AMOUNTS}
+    loss = result['Сумма потерь']
+    result['Доля возврата'] = result['Возвращенная сумма'] / loss if loss else 0
+    return result
+
+
+# Возврат по магазинам или дням
+def recovery_by(table, column):
+    stats = kernel.aggregate(table, [column], COUNTS + AMOUNTS)
+    stats = stats[stats[column].notna()].astype({col: 'int64' for col in COUNTS})
+    stats['Доля возврата'] = kernel.mean(stats['Возвращенная сумма'],
+                                         stats['Сумма потерь'])
+    return stats.reset_index(drop=True)
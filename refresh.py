@@ -0,0 +1,93 @@
+import os
+import threading
+from datetime import datetime
+
+import filters
+import hll
+import instrument
+from precompute import read_results
+from shared import open_snapshot
+from store import STORE_DIR, read_rollup, read_sketches, sync
+
+# Период проверки выгрузок фоновым обновлением, в секундах
+REFRESH_INTERVAL = float(os.environ.get('DASH_REFRESH_INTERVAL', 30))
+
+
+# Подготовленная версия данных: строки, битовые карты фильтров и агрегаты
+class Dataset:
+    def __init__(self, manifest, store_dir=STORE_DIR):
+        self.version = manifest['version']
+        with instrument.stage('load_snapshot'):
+            self.data = open_snapshot(store_dir, manifest)
+        with instrument.stage('build_index'):
+            self.index = filters.BitmapIndex(self.data)
+        with instrument.stage('load_rollup'):
+            self.rollup = read_rollup(store_dir, manifest)
+        with instrument.stage('load_sketches'):
+            self.sketches = hll.Sketches(*read_sketches(store_dir, manifest))
+        # Результаты, посчитанные заранее precompute.py (или None)
+        self.results = read_results(self.version, store_dir)
+        self.as_of = data_as_of(manifest)
+
+
+# Время данных: изменение самой свежей из загруженных выгрузок
+def data_as_of(manifest):
+    mtimes = [seen['mtime_ns'] for seen in manifest['files'].values()]
+    if not mtimes:
+        return None
+    return datetime.fromtimestamp(max(mtimes) / 1e9)
+
+
+# Фоновое обновление: следит за выгрузками, дописывает хранилище и готовит
+# новую версию вне запросов пользователей. Готовая версия подменяется одним
+# присваиванием, страница всегда получает последнюю удачную
+class RefreshWorker(threading.Thread):
+    def __init__(self, interval=REFRESH_INTERVAL, store_dir=STORE_DIR):
+        super().__init__(name='dash-refresh', daemon=True)
+        self.interval = interval
+        self.store_dir = store_dir
+        self.stopped = threading.Event()
+        self.current = None
+        self.checked_at = None
+        self.last_error = None
+        self.last_profile = None
+
+    # Одна проверка; новая версия готовится целиком до подмены
+    # В лог пишутся только проверки, которые подготовили новую версию
+    def refresh(self):
+        instrument.start('refresh')
+        changed = False
+        try:
+            with instrument.stage('sync'):
+                manifest = sync(store_dir=self.store_dir)
+            if self.current is None or manifest['version'] != self.current.version:
+                self.current = Dataset(manifest, self.store_dir)
+                changed = True
+            elif self.current.results is None:
+                # precompute.py публикует версию раньше, чем ее результаты:
+                # готовые результаты подхватываются следующими проверками
+                self.current.results = read_results(self.current.version,
+                                                    self.store_dir)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+        self.last_profile = instrument.finish(log=changed)
+        self.checked_at = datetime.now()
+        return self.current
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.refresh()
+
+    def stop(self):
+        self.stopped.set()
+
+
+# Запуск обновления: первая версия готовится сразу, дальше — в фоне
+def start_worker(interval=REFRESH_INTERVAL, store_dir=STORE_DIR):
+    worker = RefreshWorker(interval, store_dir)
+    worker.refresh()
+    if worker.current is None:
+        raise worker.last_error
+    worker.start()
+    return worker
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+import instrument
+
+# Число результатов, которые хранятся одновременно
+# (движок и три запроса на каждое состояние фильтров)
+MAX_ENTRIES = 256
+
+
+# Ключ кэша: версия данных, движок, нормализованное состояние фильтров
+# и, для отдельных запросов, их имя
+def cache_key(version, engine_name, filter_state, query=None):
+    return version, engine_name, tuple(filter_state.items()), query
+
+
+# Кэш результатов запросов с вытеснением давно не использованных (LRU)
+# и счетчиками попаданий; общий для всех сессий, поэтому под блокировкой
+class ResultCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    # Результат по ключу; при промахе вычисляется compute() вне блокировки
+    def get(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        result = compute()
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return result
+
+    # Готовый результат (например, посчитанный заранее); имеющийся не заменяется
+    def add(self, key, result):
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = result
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+    # Удаление результатов прежних версий данных
+    def drop_stale(self, version):
+        with self.lock:
+            for key in [k for k in self.entries if k[0] != version]:
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits,
+                    'misses': self.misses}
+
+
+# Общий контекст запросов одного запуска страницы: каждый запрос
+# (kpis, store_stats, daily_stats) считается только при первом обращении
+# и берется из кэша, сколько бы разделов его ни использовали
+class QueryContext:
+    def __init__(self, cache, version, source, filter_state, make_engine):
+        self.cache = cache
+        self.version = version
+        self.source = source
+        self.filter_state = filter_state
+        self.make_engine = make_engine
+        self.elapsed = 0.0
+
+    def _key(self, query):
+        return cache_key(self.version, self.source, self.filter_state, query)
+
+    # Движок тоже кэшируется: отбор строк по фильтрам выполняется один раз
+    def engine(self):
+        return self.cache.get(self._key('engine'), self.make_engine)
+
+    # Запрос движка по имени или, если задано, вычисление compute()
+    def get(self, query, compute=None):
+        compute = compute or (lambda: getattr(self.engine(), query)())
+        start = time.perf_counter()
+        with instrument.stage(f'query:{query}'):
+            result = self.cache.get(self._key(query), compute)
+        self.elapsed += time.perf_counter() - start
+        return result
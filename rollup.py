@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+import instrument
+import kernel
+from dates import day_to_date, parse_timestamps
+
+# Зерно агрегатов: день, магазин, маркетплейс, город, статус
+GRAIN = ['Дата', 'Магазин', 'Маркетплейс', 'city', 'Статус заказа']
+
+# Аддитивные меры: суммируются при слиянии агрегатов
+MEASURES = ['Сумма заказа', 'Закуп', 'Продажа']
+COUNT = 'Количество корзин'
+
+
+# Пустая таблица агрегатов (хранилище еще не заполнено)
+def empty():
+    return pd.DataFrame(columns=GRAIN + MEASURES + [COUNT])
+
+
+# Агрегаты по сырым строкам заказов
+def build(df):
+    with instrument.stage('parse_dates'):
+        _, days = parse_timestamps(df['Дата статуса'])
+    df = df.assign(Дата=day_to_date(days).astype('datetime64[s]'))
+    with instrument.stage('groupby:rollup'):
+        return kernel.aggregate(df, GRAIN, MEASURES, COUNT)
+
+
+# Слияние агрегатов: меры складываются по совпадающим ключам
+def merge(*rollups):
+    rollups = [r for r in rollups if r is not None and not r.empty]
+    if not rollups:
+        return empty()
+    combined = pd.concat(rollups, ignore_index=True)
+    merged = kernel.aggregate(combined, GRAIN, MEASURES + [COUNT])
+    return merged.astype({COUNT: 'int64'})
+
+
+# Агрегаты за период [start, end] (datetime.date). Агрегаты упорядочены
+# по дню (см. store.read_rollup), и период — отрезок, найденный бинарным поиском
+def between(rollup, start, end):
+    days = rollup['Дата'].to_numpy()
+    start, end = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+    lo = np.searchsorted(days, start, 'left')
+    hi = np.searchsorted(days, end + 1, 'left')
+    return rollup.iloc[lo:hi]
+
+
+# Итоговые метрики: сумма, количество корзин, средний чек
+def totals(rollup):
+    total_amount = rollup['Сумма заказа'].sum()
+    total_orders = int(rollup[COUNT].sum())
+    avg_check = total_amount / total_orders if total_orders else 0
+    return total_amount, total_orders, avg_check
+
+
+# Агрегация по одному измерению в формате графиков дашборда
+def _stats_by(rollup, column):
+    stats = kernel.aggregate(rollup, [column], ['Сумма заказа', COUNT]) \
+        .rename(columns={'Сумма заказа': 'Сумма заказов'})
+    stats = stats[stats[column].notna()].astype({COUNT: 'int64'})
+    stats['Средний чек'] = kernel.mean(stats['Сумма заказов'], stats[COUNT])
+    return stats.reset_index(drop=True)
+
+
+# Статистика по магазинам
+def store_stats(rollup):
+    return _stats_by(rollup, 'Магазин')
+
+
+# Статистика по дням
+def daily_stats(rollup):
+    return _stats_by(rollup, 'Дата').sort_values('Дата')
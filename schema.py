@@ -0,0 +1,101 @@
+import sys
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import instrument
+from dates import parse_timestamps, parse_windows
+
+# Колонки с небольшим числом повторяющихся значений
+CATEGORICAL = ['Магазин', 'storeCode', 'Маркетплейс', 'Статус заказа',
+               'Валюта', 'city', 'group', 'partner', 'Комплектация',
+               'Доставка', 'Опоздание']
+
+# Телефоны хранятся числом, без '+' и разделителей
+PHONES = ['Основной телефон', 'Контактный телефон']
+
+# Денежные колонки хранятся в целых тенге
+MONEY = ['Сумма заказа', 'Закуп', 'Продажа', 'Стоимость доставки',
+         'Сервисный сбор или налог', 'cash', 'kaspi', 'halyk',
+         'cardWoopkassa']
+
+# Тип для UUID: 16 байт вместо 36-символьной строки
+UUID_DTYPE = pd.ArrowDtype(pa.binary(16))
+
+UUID_PATTERN = r'[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}'
+
+
+# Колонки UUID определяются по названию
+def uuid_columns(df):
+    return [col for col in df.columns
+            if col.startswith('UUID') or col == 'partnerUserId']
+
+
+# Строки UUID -> 16-байтовые значения (одним разбором hex на всю колонку)
+def uuid_bytes(values):
+    values = pd.Series(values, dtype=object).reset_index(drop=True)
+    valid = values.astype(str).str.fullmatch(UUID_PATTERN).fillna(False) \
+        .to_numpy(dtype=bool)
+    hexes = values.where(valid, '0' * 32).astype(str) \
+        .str.replace('-', '', regex=False)
+    raw = bytes.fromhex(''.join(hexes))
+    array = pa.Array.from_buffers(pa.binary(16), len(values),
+                                  [None, pa.py_buffer(raw)])
+    array = pc.if_else(pa.array(valid), array,
+                       pa.scalar(None, pa.binary(16)))
+    return pd.array(array, dtype=UUID_DTYPE)
+
+
+# Обратное преобразование для отображения
+def uuid_str(value):
+    if value is None or value is pd.NA:
+        return None
+    return str(uuid.UUID(bytes=value))
+
+
+# Приведение строк заказов к компактной схеме
+def apply(df):
+    df = df.copy()
+    for col in CATEGORICAL:
+        if col in df:
+            df[col] = df[col].astype('category')
+    for col in MONEY:
+        if col in df:
+            df[col] = pd.to_numeric(df[col]).round().astype('Int32')
+    for col in PHONES:
+        if col in df and not pd.api.types.is_numeric_dtype(df[col]):
+            digits = df[col].astype('string').str.replace(r'\D', '', regex=True)
+            df[col] = pd.to_numeric(digits.replace('', None)).astype('Int64')
+    if 'Количество товаров' in df:
+        df['Количество товаров'] = df['Количество товаров'].astype('Int16')
+    for col in uuid_columns(df):
+        df[col] = uuid_bytes(df[col])
+    if 'Дата статуса' in df:
+        with instrument.stage('parse_dates'):
+            df['Дата статуса'], df['Дата'] = parse_timestamps(df['Дата статуса'])
+    if 'Время доставки' in df:
+        with instrument.stage('parse_windows'):
+            start, end = parse_windows(df.pop('Время доставки'))
+        df['Начало доставки'], df['Конец доставки'] = start, end
+    return df
+
+
+# Отчет о памяти по колонкам до и после приведения схемы
+def memory_report(before, after):
+    report = pd.DataFrame({
+        'До, КБ': before.memory_usage(index=False, deep=True) / 1024,
+        'После, КБ': after.memory_usage(index=False, deep=True) / 1024,
+    })
+    report.loc['Итого'] = report.sum()
+    report['Сжатие'] = report['До, КБ'] / report['После, КБ']
+    return report.round(1)
+
+
+if __name__ == '__main__':
+    from store import read_store
+    from xlsx_reader import read_xlsx
+
+    raw = read_xlsx(sys.argv[1]) if len(sys.argv) > 1 else read_store()
+    print(memory_report(raw, apply(raw)).to_string())
@@ -0,0 +1,53 @@
+import glob
+import os
+
+import pyarrow as pa
+
+import schema
+from store import STORE_DIR, read_manifest, read_store
+
+# Снимок хранилища в Arrow IPC без сжатия: процессы отображают его в память,
+# а страницы файла делятся между ними через кэш ОС
+
+
+def snapshot_path(version, store_dir=STORE_DIR):
+    return os.path.join(store_dir, f'orders-{version:05d}.arrow')
+
+
+# Запись снимка строк в компактной схеме (атомарно, через временный файл)
+def write_snapshot(df, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+# Удаление снимков прежних версий (уже отображенные файлы остаются доступны)
+def _drop_old_snapshots(store_dir, current):
+    for path in glob.glob(os.path.join(store_dir, 'orders-*.arrow')):
+        if path != current:
+            os.remove(path)
+
+
+# UUID остаются 16-байтовыми значениями Arrow, как в schema.apply()
+def _types_mapper(arrow_type):
+    if arrow_type == schema.UUID_DTYPE.pyarrow_dtype:
+        return schema.UUID_DTYPE
+    return None
+
+
+# Строки заказов текущей версии поверх отображенного в память снимка.
+# Числовые колонки без пропусков — представления без копирования,
+# поэтому результат нельзя изменять на месте
+def open_snapshot(store_dir=STORE_DIR, manifest=None):
+    manifest = manifest or read_manifest(store_dir)
+    path = snapshot_path(manifest['version'], store_dir)
+    if not os.path.exists(path):
+        write_snapshot(schema.apply(read_store(store_dir, manifest)), path)
+        _drop_old_snapshots(store_dir, path)
+
+    source = pa.memory_map(path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True, types_mapper=_types_mapper)
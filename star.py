@@ -0,0 +1,206 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+import schema
+from ingest import CACHE_DIR, file_hash, read_table
+
+# Каталог звездной схемы
+STAR_DIR = os.path.join(CACHE_DIR, 'star')
+
+ORDERS = 'orders.xlsx'
+PRODUCTS = 'products.xlsx'
+
+# Измерения: натуральный ключ -> атрибуты
+DIMENSIONS = {
+    'store': ('UUID магазина', ['storeCode', 'Магазин', 'Маркетплейс',
+                                'city', 'group']),
+    'product': ('UUID товара', ['SKU', 'Штрих-код', 'Наименование', 'Бренд',
+                                'Группа', 'Раздел', 'Подраздел']),
+    'customer': ('UUID Покупателя', ['Покупатель', 'Основной телефон',
+                                     'Контактный телефон', 'partner',
+                                     'partnerUserId']),
+}
+
+# Меры фактов уровня заказа и уровня строки
+ORDER_MEASURES = ['Закуп', 'Продажа', 'Стоимость доставки',
+                  'Сервисный сбор или налог', 'Сумма заказа', 'cash', 'kaspi',
+                  'halyk', 'cardWoopkassa', 'Количество товаров']
+LINE_MEASURES = ['Количество', 'Закуп', 'Продажа', 'Наценка']
+
+TABLES = ['order_fact', 'line_fact', 'order_dim',
+          'store_dim', 'product_dim', 'customer_dim']
+
+# Факты разложены по дням статуса (каталоги Дата=<номер дня>),
+# чтение за период открывает только каталоги его дней
+FACTS = ['order_fact', 'line_fact']
+DAY_PARTITIONING = ds.partitioning(pa.schema([('Дата', pa.int32())]),
+                                   flavor='hive')
+
+
+# Измерение с целочисленным суррогатным ключем по всем источникам
+def build_dimension(frames, key, attributes):
+    columns = [key] + attributes
+    rows = pd.concat([
+        f[[c for c in columns if c in f]] for f in frames if key in f
+    ], ignore_index=True)
+    # Атрибут берется из последней строки, где он заполнен: в выгрузке
+    # товаров нет, например, маркетплейса и города магазина
+    rows = rows.dropna(subset=[key]).groupby(key, sort=False).last() \
+        .reset_index()
+    rows.insert(0, 'key', np.arange(len(rows), dtype='int32'))
+    return rows
+
+
+# Суррогатные ключи по натуральным через хэш-индекс измерения (-1 — нет в измерении)
+def lookup(dimension, key, values):
+    index = pd.Index(dimension[key])
+    return index.get_indexer(values).astype('int32')
+
+
+# Сборка звездной схемы: одно соединение заказов и строк при загрузке
+def build(orders, products):
+    dims = {
+        name: build_dimension([orders, products], key, attributes)
+        for name, (key, attributes) in DIMENSIONS.items()
+    }
+    # Заказ ссылается на магазин и покупателя суррогатными ключами
+    order_dim = build_dimension(
+        [orders, products], 'UUID заказа',
+        ['Заказ', 'UUID магазина', 'UUID Покупателя']
+    )
+    order_dim['store_key'] = lookup(dims['store'], 'UUID магазина',
+                                    order_dim.pop('UUID магазина'))
+    order_dim['customer_key'] = lookup(dims['customer'], 'UUID Покупателя',
+                                       order_dim.pop('UUID Покупателя'))
+
+    order_fact = pd.concat([
+        pd.DataFrame({
+            'order_key': lookup(order_dim, 'UUID заказа', orders['UUID заказа']),
+            'store_key': lookup(dims['store'], 'UUID магазина',
+                                orders['UUID магазина']),
+            'customer_key': lookup(dims['customer'], 'UUID Покупателя',
+                                   orders['UUID Покупателя']),
+            'Статус заказа': orders['Статус заказа'],
+            'Дата статуса': orders['Дата статуса'],
+        }),
+        orders[[c for c in ORDER_MEASURES if c in orders]].reset_index(drop=True),
+    ], axis=1)
+
+    line_fact = pd.concat([
+        pd.DataFrame({
+            'order_key': lookup(order_dim, 'UUID заказа',
+                                products['UUID заказа']),
+            'product_key': lookup(dims['product'], 'UUID товара',
+                                  products['UUID товара']),
+            'store_key': lookup(dims['store'], 'UUID магазина',
+                                products['UUID магазина']),
+            'customer_key': lookup(dims['customer'], 'UUID Покупателя',
+                                   products['UUID Покупателя']),
+            'Статус заказа': products['Статус заказа'],
+            'Дата статуса': products['Дата статуса'],
+        }),
+        products[[c for c in LINE_MEASURES if c in products]]
+        .reset_index(drop=True),
+    ], axis=1)
+
+    tables = {
+        'order_fact': order_fact,
+        'line_fact': line_fact,
+        'order_dim': order_dim,
+        'store_dim': dims['store'],
+        'product_dim': dims['product'],
+        'customer_dim': dims['customer'],
+    }
+    # Факты приводятся к компактной схеме: статус — категория, суммы в тенге,
+    # 'Дата статуса' разбирается в datetime64 и номер дня
+    return {name: schema.apply(table) if name.endswith('fact') else table
+            for name, table in tables.items()}
+
+
+def _source_hashes(orders_path, products_path):
+    return {path: file_hash(path) for path in (orders_path, products_path)}
+
+
+def _meta_path(star_dir):
+    return os.path.join(star_dir, 'meta.json')
+
+
+# Схема пересобирается, только если изменилась одна из выгрузок
+def is_fresh(orders_path=ORDERS, products_path=PRODUCTS, star_dir=STAR_DIR):
+    try:
+        with open(_meta_path(star_dir), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta == _source_hashes(orders_path, products_path)
+
+
+# Сборка и сохранение звездной схемы в Parquet
+def ensure(orders_path=ORDERS, products_path=PRODUCTS, star_dir=STAR_DIR):
+    if is_fresh(orders_path, products_path, star_dir):
+        return False
+
+    os.makedirs(star_dir, exist_ok=True)
+    tables = build(read_table(orders_path), read_table(products_path))
+    for name, table in tables.items():
+        if name in FACTS:
+            _write_fact(table, os.path.join(star_dir, name))
+            continue
+        path = os.path.join(star_dir, f'{name}.parquet')
+        table.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+    with open(_meta_path(star_dir), 'w', encoding='utf-8') as f:
+        json.dump(_source_hashes(orders_path, products_path), f)
+    return True
+
+
+# Запись факта по дням: новый каталог собирается рядом и подменяет прежний
+def _write_fact(table, path):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    ds.write_dataset(pa.Table.from_pandas(table, preserve_index=False),
+                     tmp_path, format='parquet',
+                     partitioning=DAY_PARTITIONING,
+                     existing_data_behavior='delete_matching')
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def _day_number(value):
+    return int(np.datetime64(value, 'D').astype('int64'))
+
+
+# Факт за период [start, end] (datetime.date или None — без границы)
+def _read_fact(path, start=None, end=None):
+    condition = None
+    if start is not None:
+        condition = ds.field('Дата') >= _day_number(start)
+    if end is not None:
+        upper = ds.field('Дата') <= _day_number(end)
+        condition = upper if condition is None else condition & upper
+    dataset = ds.dataset(path, format='parquet', partitioning=DAY_PARTITIONING)
+    return dataset.to_table(filter=condition).to_pandas()
+
+
+# Чтение таблиц звездной схемы; факты — только за период, если он задан
+def read_star(tables=TABLES, star_dir=STAR_DIR, start=None, end=None):
+    return {
+        name: _read_fact(os.path.join(star_dir, name), start, end)
+        if name in FACTS
+        else pd.read_parquet(os.path.join(star_dir, f'{name}.parquet'))
+        for name in tables
+    }
+
+
+if __name__ == '__main__':
+    rebuilt = ensure()
+    for name, table in read_star().items():
+        print(f'{name}: {len(table)} строк')
+    print('Пересобрано' if rebuilt else 'Схема актуальна')
@@ -0,0 +1,529 @@
+import glob
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import hll
+import rollup
+from dates import NO_DAY, day_to_date, parse_timestamps
+from ingest import CACHE_DIR, file_hash, normalize, write_chunks
+from xlsx_reader import CHUNK_SIZE, iter_chunks
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Каталог накопительного хранилища заказов
+STORE_DIR = os.path.join(CACHE_DIR, 'store')
+
+# Ежедневные выгрузки складываются сюда; сводный отчет тоже учитывается
+EXPORTS_DIR = 'exports'
+COMBINED_REPORT = 'combined_report.xlsx'
+
+# Строка заказа однозначно определяется заказом и статусом
+KEY_COLUMNS = ['UUID заказа', 'UUID статуса заказа']
+
+# Части хранилища разложены по дням статуса: orders/day=YYYY-MM-DD/part-*.parquet;
+# строки без разбираемой даты — в orders/day=none
+NO_DAY_PARTITION = 'day=none'
+
+# Сколько файлов дней одна загрузка держит открытыми одновременно
+MAX_OPEN_PARTS = 256
+# Служебная колонка временных файлов загрузки: раздел дня строки
+PARTITION_COLUMN = '__partition'
+
+# Синхронизация из нескольких сессий Streamlit идет по очереди
+_lock = threading.Lock()
+
+
+# Запись в хранилище по очереди: между потоками процесса — _lock, между
+# процессами (дашборд и precompute.py из cron) — блокировка файла в
+# каталоге хранилища. Без fcntl (Windows) остается только блокировка потоков
+@contextmanager
+def _locked(store_dir):
+    with _lock:
+        os.makedirs(store_dir, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(store_dir, '.lock'), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# Список выгрузок, которые нужно загрузить в хранилище
+def export_paths(exports_dir=EXPORTS_DIR):
+    paths = sorted(glob.glob(os.path.join(exports_dir, '*.xlsx')))
+    if os.path.exists(COMBINED_REPORT):
+        paths.insert(0, COMBINED_REPORT)
+    return paths
+
+
+def _paths(store_dir):
+    return {
+        'manifest': os.path.join(store_dir, 'manifest.json'),
+        'orders': os.path.join(store_dir, 'orders'),
+    }
+
+
+# Манифест: версия данных, загруженные файлы и части хранилища
+def read_manifest(store_dir=STORE_DIR):
+    try:
+        with open(_paths(store_dir)['manifest'], encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'version': 0, 'files': {}, 'parts': [], 'keys': None,
+                'rollup': None, 'sketches': None}
+
+
+def _write_manifest(store_dir, manifest):
+    path = _paths(store_dir)['manifest']
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# 64-битные хэши ключей строк
+def row_keys(df):
+    return pd.util.hash_pandas_object(
+        df[KEY_COLUMNS].astype(str), index=False
+    ).to_numpy()
+
+
+# Отсортированный массив уже загруженных ключей (читается через mmap)
+def _load_keys(store_dir, manifest):
+    if not manifest['keys']:
+        return np.empty(0, dtype='uint64')
+    return np.load(os.path.join(store_dir, manifest['keys']), mmap_mode='r')
+
+
+# Удаление файлов ключей, агрегатов и эскизов, на которые манифест больше
+# не ссылается, и частей прежней раскладки без разделов по дням
+def _drop_stale(store_dir, manifest):
+    current = {manifest['keys'], manifest.get('rollup'),
+               *_sketch_files(manifest).values()}
+    for pattern in ('keys-*.npy', 'rollup-*.parquet', 'sketches-*.parquet',
+                    'sketches/*/sketches-*.parquet'):
+        for path in glob.glob(os.path.join(store_dir, pattern)):
+            if os.path.relpath(path, store_dir).replace(os.sep, '/') \
+                    not in current:
+                os.remove(path)
+    parts = set(manifest['parts'])
+    for path in glob.glob(os.path.join(_paths(store_dir)['orders'], 'part-*.parquet')):
+        if os.path.basename(path) not in parts:
+            os.remove(path)
+
+
+# Раздел строки по дню 'Дата статуса'
+def day_partitions(df):
+    _, days = parse_timestamps(df['Дата статуса'])
+    codes, uniques = pd.factorize(days)
+    labels = np.array([
+        NO_DAY_PARTITION if day == NO_DAY
+        else f'day={day_to_date([day])[0]}'
+        for day in uniques
+    ], dtype=object)
+    return labels[codes]
+
+
+# День раздела части (datetime64[D]) или None для строк без даты
+def part_day(part):
+    partition = part.rpartition('/')[0]
+    if partition == NO_DAY_PARTITION:
+        return None
+    return np.datetime64(partition.removeprefix('day='), 'D')
+
+
+# Части, пересекающиеся с периодом [start, end] (datetime.date или None —
+# без границы). При заданном периоде строки без даты не попадают в выборку;
+# части прежней раскладки без разделов читаются всегда
+def parts_between(manifest, start=None, end=None):
+    parts = sorted(manifest['parts'])
+    if start is None and end is None:
+        return parts
+    start = np.datetime64(start, 'D') if start is not None else None
+    end = np.datetime64(end, 'D') if end is not None else None
+    selected = []
+    for part in parts:
+        if '/' not in part:
+            selected.append(part)
+            continue
+        day = part_day(part)
+        if day is not None and (start is None or day >= start) \
+                and (end is None or day <= end):
+            selected.append(part)
+    return selected
+
+
+# Агрегаты хранилища (зерно и меры описаны в rollup.py)
+def read_rollup(store_dir=STORE_DIR, manifest=None):
+    manifest = manifest or read_manifest(store_dir)
+    if not manifest.get('rollup'):
+        return rollup.empty()
+    agg = pd.read_parquet(os.path.join(store_dir, manifest['rollup']))
+    # Агрегаты, записанные до упорядочивания по дню
+    if not agg['Дата'].is_monotonic_increasing:
+        agg = agg.sort_values('Дата', kind='stable', ignore_index=True)
+    return agg
+
+
+# Агрегаты обновляются при каждой загрузке: к ним добавляется вклад новых строк
+def _write_rollup(store_dir, manifest, delta):
+    current = read_rollup(store_dir, manifest)
+    rollup_file = f'rollup-{manifest["version"]:05d}.parquet'
+    # Агрегаты упорядочены по дню: период отбирается бинарным поиском
+    rollup.merge(current, delta).sort_values('Дата', kind='stable').to_parquet(
+        os.path.join(store_dir, rollup_file), index=False
+    )
+    manifest['rollup'] = rollup_file
+
+
+# Эскизы HyperLogLog уникальных покупателей и заказов по (день, магазин).
+# Как и части, лежат по файлу на день: manifest['sketches'] — раздел дня ->
+# файл; хранилища до раскладки по дням держат их одним файлом
+def read_sketches(store_dir=STORE_DIR, manifest=None):
+    manifest = manifest or read_manifest(store_dir)
+    files = _sketch_files(manifest)
+    if not files:
+        return hll.merge()
+    # Разделы упорядочены по дню, day=none — последним, как и в hll.merge
+    tables = [pq.ParquetFile(os.path.join(store_dir, files[partition])).read()
+              for partition in sorted(files)]
+    return hll.from_frame(concat_parts(tables).to_pandas())
+
+
+def _sketch_files(manifest):
+    files = manifest.get('sketches') or {}
+    if isinstance(files, str):
+        return {'': files}
+    return files
+
+
+# Раздел дня для дат эскизов (NaT — строки без даты)
+def _sketch_partitions(dates):
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    return np.where(np.isnat(dates), NO_DAY_PARTITION,
+                    np.char.add('day=', np.datetime_as_string(dates)))
+
+
+# Эскизы, как и агрегаты, дополняются вкладом новых строк
+def _sketch(rows):
+    _, days = parse_timestamps(rows['Дата статуса'])
+    return hll.build(rows, day_to_date(days))
+
+
+# Переписываются только дни, в которые пришли новые строки
+def _write_sketches(store_dir, manifest, delta):
+    files = dict(_sketch_files(manifest))
+    # Эскизы одним файлом раскладываются по дням один раз
+    if '' in files:
+        delta = hll.merge(read_sketches(store_dir, manifest), delta)
+        files = {}
+    keys, sketches = delta
+    partitions = _sketch_partitions(keys['Дата'])
+    name = f'sketches-{manifest["version"]:05d}.parquet'
+    for partition in np.unique(partitions).tolist():
+        rows = np.flatnonzero(partitions == partition)
+        day = (keys.take(rows).reset_index(drop=True),
+               {column: s[rows] for column, s in sketches.items()})
+        if partition in files:
+            day = hll.merge(hll.from_frame(pd.read_parquet(
+                os.path.join(store_dir, files[partition]))), day)
+        sketches_file = f'sketches/{partition}/{name}'
+        os.makedirs(os.path.join(store_dir, 'sketches', partition), exist_ok=True)
+        hll.to_frame(*day).to_parquet(os.path.join(store_dir, sketches_file),
+                                      index=False)
+        files[partition] = sketches_file
+    manifest['sketches'] = files
+
+
+# Отбор строк, которых еще нет в хранилище
+def new_rows(df, known_keys):
+    keys = row_keys(df)
+    # Дубликаты внутри самой выгрузки тоже отбрасываются
+    _, first = np.unique(keys, return_index=True)
+    mask = np.zeros(len(df), dtype=bool)
+    mask[first] = True
+
+    if len(known_keys):
+        pos = np.searchsorted(known_keys, keys)
+        pos[pos == len(known_keys)] = 0
+        mask &= known_keys[pos] != keys
+    return df[mask], keys[mask]
+
+
+# Дописывание новых строк из порций: порции копит PartWriter и пишет
+# по файлу на день, ключи, агрегаты и эскизы — один раз
+# за загрузку по вкладам порций. Возвращает число добавленных строк
+def _append(chunks, store_dir, manifest):
+    paths = _paths(store_dir)
+    os.makedirs(paths['orders'], exist_ok=True)
+    known_keys = np.asarray(_load_keys(store_dir, manifest))
+    # Части и ключи пишутся под новыми именами; фиксирует их запись манифеста
+    version = manifest['version'] + 1
+    writer = PartWriter(paths['orders'], version)
+    rollups, sketches = [], []
+    added = 0
+    try:
+        for chunk in chunks:
+            rows, keys = new_rows(chunk, known_keys)
+            if rows.empty:
+                continue
+            # Ключи порции известны следующим: повторы между порциями
+            # отбрасываются
+            known_keys = np.union1d(known_keys, keys)
+            writer.write(rows)
+            rollups.append(rollup.build(rows))
+            sketches.append(_sketch(rows))
+            added += len(rows)
+    finally:
+        parts = writer.close()
+    if not added:
+        return 0
+
+    manifest['version'] = version
+    keys_file = f'keys-{version:05d}.npy'
+    np.save(os.path.join(store_dir, keys_file), known_keys)
+
+    _write_rollup(store_dir, manifest, rollup.merge(*rollups))
+    _write_sketches(store_dir, manifest, hll.merge(*sketches))
+
+    manifest['parts'].extend(parts)
+    manifest['keys'] = keys_file
+    return added
+
+
+# Порции выгрузки: лист читается потоком во временный Parquet рядом с
+# хранилищем (типы колонок одни на весь файл, см. ingest.write_chunks)
+# и отдается пакетами по CHUNK_SIZE строк
+def _export_chunks(path, store_dir):
+    tmp_path = os.path.join(store_dir, 'incoming.parquet')
+    write_chunks(iter_chunks(path), tmp_path)
+    try:
+        for batch in pq.ParquetFile(tmp_path).iter_batches(CHUNK_SIZE):
+            yield batch.to_pandas()
+    finally:
+        os.remove(tmp_path)
+
+
+# Части одной загрузки: по файлу на день, сколько бы порций ни пришло.
+# Порции сначала копятся во временных файлах (типы колонок в них могут
+# различаться), при закрытии раскладываются по дням. За один проход по
+# порциям открыто не больше MAX_OPEN_PARTS файлов дней
+class PartWriter:
+    def __init__(self, orders_dir, version):
+        self.orders_dir = orders_dir
+        self.version = version
+        self.spool = os.path.join(orders_dir, f'.spool-{version:05d}')
+        self.chunks = []
+        self.partitions = set()
+
+    def write(self, rows):
+        rows = normalize(rows.reset_index(drop=True))
+        partitions = day_partitions(rows)
+        table = pa.Table.from_pandas(rows, preserve_index=False) \
+            .append_column(PARTITION_COLUMN, pa.array(partitions))
+        os.makedirs(self.spool, exist_ok=True)
+        path = os.path.join(self.spool, f'{len(self.chunks):05d}.parquet')
+        pq.write_table(table, path)
+        self.chunks.append(path)
+        self.partitions.update(np.unique(partitions).tolist())
+
+    # Раскладка накопленных порций по дням; возвращает записанные части
+    def close(self):
+        try:
+            if not self.chunks:
+                return []
+            # Общая схема порций: колонка, пустая в одной порции, получает
+            # тип из другой, число вместе с текстом — текст
+            schema = concat_parts(
+                [pq.read_schema(path).empty_table() for path in self.chunks]
+            ).schema
+            names = sorted(self.partitions)
+            for start in range(0, len(names), MAX_OPEN_PARTS):
+                self._split(names[start:start + MAX_OPEN_PARTS], schema)
+            return [self._part(partition) for partition in names]
+        finally:
+            shutil.rmtree(self.spool, ignore_errors=True)
+
+    def _part(self, partition):
+        return f'{partition}/part-{self.version:05d}.parquet'
+
+    def _split(self, names, schema):
+        wanted = pa.array(names)
+        writers = {}
+        try:
+            for path in self.chunks:
+                table = concat_parts([schema.empty_table(), pq.read_table(path)])
+                table = table.filter(pc.is_in(table.column(PARTITION_COLUMN), wanted))
+                if not table.num_rows:
+                    continue
+                table = table.sort_by(PARTITION_COLUMN)
+                partitions = table.column(PARTITION_COLUMN).to_numpy(zero_copy_only=False)
+                table = table.drop_columns([PARTITION_COLUMN])
+                labels, starts = np.unique(partitions, return_index=True)
+                ends = list(starts[1:]) + [len(partitions)]
+                for partition, start, end in zip(labels, starts, ends):
+                    writer = writers.get(partition)
+                    if writer is None:
+                        os.makedirs(os.path.join(self.orders_dir, partition),
+                                    exist_ok=True)
+                        writer = writers[partition] = pq.ParquetWriter(
+                            os.path.join(self.orders_dir, self._part(partition)),
+                            table.schema,
+                        )
+                    writer.write_table(table.slice(start, end - start))
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+
+# Перекладка частей прежней раскладки (без разделов) по дням
+def _repartition(store_dir, manifest):
+    flat = [part for part in manifest['parts'] if '/' not in part]
+    rows = read_store(store_dir, dict(manifest, parts=flat))
+    manifest['version'] += 1
+    writer = PartWriter(_paths(store_dir)['orders'], manifest['version'])
+    writer.write(rows)
+    parts = writer.close()
+    manifest['parts'] = [part for part in manifest['parts']
+                         if '/' in part] + parts
+
+
+# Загрузка только новых или измененных выгрузок
+def sync(sources=None, store_dir=STORE_DIR):
+    sources = export_paths() if sources is None else sources
+    with _locked(store_dir):
+        manifest = read_manifest(store_dir)
+        changed = False
+
+        # Хранилище, созданное до появления агрегатов, пересчитывается один раз
+        if manifest['parts'] and not manifest.get('rollup'):
+            manifest['version'] += 1
+            _write_rollup(store_dir, manifest,
+                          rollup.build(read_store(store_dir, manifest)))
+            changed = True
+
+        # Эскизы уникальных значений для хранилища, созданного до них
+        if manifest['parts'] and not manifest.get('sketches'):
+            manifest['version'] += 1
+            _write_sketches(store_dir, manifest,
+                            _sketch(read_store(store_dir, manifest)))
+            changed = True
+        # Эскизы одним файлом раскладываются по дням
+        elif isinstance(manifest.get('sketches'), str):
+            manifest['version'] += 1
+            _write_sketches(store_dir, manifest, hll.merge())
+            changed = True
+
+        # Хранилище прежней раскладки перекладывается по дням один раз
+        if any('/' not in part for part in manifest['parts']):
+            _repartition(store_dir, manifest)
+            changed = True
+
+        for path in sources:
+            stat = os.stat(path)
+            key = os.path.abspath(path)
+            seen = manifest['files'].get(key)
+            if seen and seen['mtime_ns'] == stat.st_mtime_ns \
+                    and seen['size'] == stat.st_size:
+                continue
+
+            digest = file_hash(path)
+            if not seen or seen['hash'] != digest:
+                added = _append(_export_chunks(path, store_dir), store_dir,
+                                manifest)
+                rows = (seen or {}).get('rows', 0) + added
+            else:
+                rows = seen['rows']
+
+            manifest['files'][key] = {
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'hash': digest,
+                'rows': rows,
+            }
+            changed = True
+
+        if changed:
+            _write_manifest(store_dir, manifest)
+            _drop_stale(store_dir, manifest)
+        return manifest
+
+
+# Загрузка готового DataFrame так же, как новой выгрузки
+def ingest_frame(df, store_dir=STORE_DIR):
+    with _locked(store_dir):
+        manifest = read_manifest(store_dir)
+        added = _append([df], store_dir, manifest)
+        if added:
+            _write_manifest(store_dir, manifest)
+            _drop_stale(store_dir, manifest)
+        return manifest
+
+
+# Чтение накопленных строк, по желанию — только частей за период.
+# Части идут по порядку дней, поэтому строки упорядочены по дню статуса;
+# в pandas переводится уже собранная таблица Arrow
+def read_store(store_dir=STORE_DIR, manifest=None, start=None, end=None):
+    manifest = manifest or read_manifest(store_dir)
+    orders_dir = _paths(store_dir)['orders']
+    tables = [
+        pq.ParquetFile(os.path.join(orders_dir, part)).read()
+        for part in parts_between(manifest, start, end)
+    ]
+    if not tables:
+        return pd.DataFrame(columns=KEY_COLUMNS)
+    return concat_parts(tables).to_pandas()
+
+
+def _is_text(arrow_type):
+    return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+
+# Склейка частей с разными типами одной колонки: пропуски (null) и числа
+# сводит promote_options, а колонка, где в одних частях числа, а в других
+# текст (например, пустая в одной выгрузке и заполненная в другой), читается
+# текстом
+def concat_parts(tables):
+    types = {}
+    for table in tables:
+        for field in table.schema:
+            types.setdefault(field.name, set()).add(field.type)
+    text = {
+        name for name, seen in types.items()
+        if any(_is_text(t) for t in seen)
+        and any(not _is_text(t) and not pa.types.is_null(t) for t in seen)
+    }
+    if text:
+        tables = [_cast_text(table, text) for table in tables]
+    return pa.concat_tables(tables, promote_options='permissive')
+
+
+def _cast_text(table, columns):
+    for i, field in enumerate(table.schema):
+        if field.name in columns and not _is_text(field.type) \
+                and not pa.types.is_null(field.type):
+            table = table.set_column(
+                i, field.name, table.column(i).cast(pa.large_string())
+            )
+    # Метаданные pandas описывали бы прежний тип колонки
+    return table.replace_schema_metadata(None)
+
+
+if __name__ == '__main__':
+    manifest = sync()
+    print(f'Версия данных: {manifest["version"]}, частей: {len(manifest["parts"])}')
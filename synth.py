@@ -0,0 +1,287 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# Колонки выгрузок в том же порядке, что в orders.xlsx и products.xlsx
+ORDERS_COLUMNS = [
+    'Дата статуса', 'Статус заказа', 'UUID статуса заказа', 'Маркетплейс',
+    'UUID маркетплейса', 'storeCode', 'Магазин', 'UUID магазина', 'Заказ',
+    'UUID заказа', 'Покупатель', 'UUID Покупателя', 'Основной телефон',
+    'Контактный телефон', 'partner', 'partnerUserId', 'Закуп', 'Продажа',
+    'Стоимость доставки', 'Сервисный сбор или налог', 'Сумма заказа', 'Валюта',
+    'cash', 'kaspi', 'halyk', 'cardWoopkassa', 'cardNumber',
+    'Количество товаров', 'Комплектация', 'UUID сборщика', 'Доставка',
+    'UUID курьера', 'Время доставки', 'Опоздание', 'Чек', 'city', 'group',
+]
+PRODUCTS_COLUMNS = [
+    'Дата статуса', 'Статус заказа', 'UUID статуса заказа', 'Заказ',
+    'UUID заказа', 'Комплектация', 'SKU', 'Штрих-код', 'Наименование',
+    'UUID товара', 'Бренд', 'Группа', 'Раздел', 'Подраздел', 'Количество',
+    'Закуп', 'Продажа', 'Наценка', 'Валюта', 'Покупатель', 'UUID Покупателя',
+    'Основной телефон', 'Контактный телефон', 'partner', 'partnerUserId',
+    'storeCode', 'Магазин', 'UUID магазина',
+]
+
+# Распределения, близкие к реальным выгрузкам
+CITIES = {'Алматы': 0.80, 'Астана': 0.07, 'Караганда': 0.04, 'Шымкент': 0.04,
+          'Актобе': 0.03, 'Павлодар': 0.02}
+GROUPS = {'Супермаркеты': 0.80, 'Цветы': 0.06, 'Товары для животных': 0.05,
+          'Благотворительность': 0.04, 'Рестораны': 0.05}
+PAYMENTS = {'kaspi': 0.70, 'halyk': 0.15, 'cardWoopkassa': 0.10, 'cash': 0.05}
+
+# Статусы в порядке прохождения заказа; часть заказов отменяется по пути
+STATUS_FLOW = ['Новый', 'Собирается', 'Собран', 'Доставляется', 'Выполнен']
+CANCELLED = 'Отменен'
+
+MARKETPLACE = 'Onay.kz'
+PARTNER = 'onaykz: '
+
+
+# Случайные UUID в текстовом виде
+def uuids(rng, n):
+    hexed = rng.integers(0, 256, size=16 * n, dtype=np.uint8).tobytes().hex()
+    return [
+        f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}'
+        for h in (hexed[i:i + 32] for i in range(0, 32 * n, 32))
+    ]
+
+
+# Веса по закону Ципфа: немногие магазины и товары дают большую часть заказов
+def zipf_weights(n, exponent=1.1):
+    weights = 1 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _pick(rng, choices, n):
+    return rng.choice(list(choices), size=n, p=list(choices.values()))
+
+
+def _format_timestamps(seconds):
+    return pd.to_datetime(seconds, unit='s').strftime('%d.%m.%Y %H:%M:%S')
+
+
+# Справочники магазинов, покупателей и товаров
+def _entities(rng, stores, customers, skus, brands):
+    store_table = pd.DataFrame({
+        'storeCode': [f'store{i}' for i in range(stores)],
+        'Магазин': [f'Магазин {i}' for i in range(stores)],
+        'UUID магазина': uuids(rng, stores),
+        'city': _pick(rng, CITIES, stores),
+        'group': _pick(rng, GROUPS, stores),
+    })
+
+    phones = rng.integers(77_000_000_000, 77_799_999_999, size=customers)
+    customer_table = pd.DataFrame({
+        'UUID Покупателя': uuids(rng, customers),
+        'Основной телефон': phones.astype(str),
+        'Контактный телефон': phones,
+        'partnerUserId': uuids(rng, customers),
+    })
+
+    sections = rng.integers(0, 120, size=skus)
+    sku_table = pd.DataFrame({
+        'SKU': rng.choice(10_000_000, size=skus, replace=False).astype(str),
+        'Наименование': [f'Товар {i}' for i in range(skus)],
+        'UUID товара': uuids(rng, skus),
+        'Бренд': [f'Бренд {b}' for b in rng.integers(0, brands, size=skus)],
+        'Группа': [f'Группа {s % 40}' for s in sections],
+        'Раздел': [f'Раздел {s}' for s in sections],
+        'Цена': np.round(rng.lognormal(7, 0.8, size=skus), 2),
+    })
+    return store_table, customer_table, sku_table
+
+
+# Синтетические выгрузки заказов и товаров заданного размера.
+# history=True дает по строке на каждый пройденный статус заказа
+def generate(orders=10_000, stores=60, customers=None, skus=20_000,
+             brands=2_000, start='2023-01-01', end='2025-01-31',
+             cancel_rate=0.15, history=False, seed=0):
+    rng = np.random.default_rng(seed)
+    customers = customers or max(1, int(orders * 0.6))
+    store_table, customer_table, sku_table = _entities(
+        rng, stores, customers, skus, brands
+    )
+
+    # Заказы: магазин и покупатель с перекосом популярности, время — равномерно
+    store_idx = rng.choice(stores, size=orders, p=zipf_weights(stores))
+    customer_idx = rng.choice(customers, size=orders,
+                              p=zipf_weights(customers, 0.8))
+    t0 = pd.Timestamp(start).value // 10**9
+    t1 = pd.Timestamp(end).value // 10**9
+    created = np.sort(rng.integers(t0, t1, size=orders))
+
+    # Строки заказа: число позиций, товары, количество и цены
+    lines = np.maximum(1, rng.geometric(1 / 7.6, size=orders))
+    line_order = np.repeat(np.arange(orders), lines)
+    line_sku = rng.choice(skus, size=len(line_order), p=zipf_weights(skus))
+    line_qty = np.where(rng.random(len(line_order)) < 0.8,
+                        rng.integers(1, 4, size=len(line_order)),
+                        np.round(rng.uniform(0.1, 3, size=len(line_order)), 3))
+    line_price = sku_table['Цена'].to_numpy()[line_sku]
+    line_sum = np.round(line_qty * line_price, 2)
+
+    goods = np.bincount(line_order, weights=line_sum, minlength=orders)
+    delivery = rng.choice([0, 590, 990], size=orders, p=[0.5, 0.3, 0.2])
+    fee = np.round(goods * 0.1, 2)
+    total = np.round(goods + delivery + fee, 2)
+
+    # Последний достигнутый статус: отмененные заказы обрываются на случайном шаге
+    cancelled = rng.random(orders) < cancel_rate
+    reached = np.where(cancelled,
+                       rng.integers(0, len(STATUS_FLOW) - 1, size=orders),
+                       len(STATUS_FLOW) - 1)
+
+    order_uuid = np.array(uuids(rng, orders), dtype=object)
+    order_code = np.array(
+        [''.join(chr(65 + c) for c in row)
+         for row in rng.integers(0, 26, size=(orders, 6))], dtype=object
+    )
+    payment = _pick(rng, PAYMENTS, orders)
+    stores_of = store_table.iloc[store_idx].reset_index(drop=True)
+    customers_of = customer_table.iloc[customer_idx].reset_index(drop=True)
+
+    # События статусов: все пройденные шаги или только итоговый
+    if history:
+        steps = reached + 1 + cancelled
+        event_order = np.repeat(np.arange(orders), steps)
+        step = np.arange(len(event_order)) - np.repeat(np.cumsum(steps) - steps,
+                                                       steps)
+        is_cancel = cancelled[event_order] & (step == steps[event_order] - 1)
+    else:
+        event_order = np.arange(orders)
+        step = reached.copy()
+        is_cancel = cancelled
+    flow = np.array(STATUS_FLOW, dtype=object)
+    status = np.where(is_cancel, CANCELLED, flow[np.minimum(step, len(flow) - 1)])
+    # Между статусами проходит от 5 минут до часа
+    gaps = np.where(step > 0, rng.integers(300, 3600, size=len(event_order)), 0)
+    elapsed = np.cumsum(gaps)
+    first = np.r_[0, np.flatnonzero(np.diff(event_order)) + 1]
+    elapsed -= np.repeat(elapsed[first] - gaps[first],
+                         np.diff(np.r_[first, len(event_order)]))
+    event_time = created[event_order] + elapsed
+
+    slot = (event_time // 3600 % 24).clip(9, 21)
+    windows = pd.to_datetime(event_time, unit='s').strftime('%d.%m.%Y') \
+        + ' ' + pd.Series(slot).map('{:02d}:00'.format) \
+        + ' - ' + pd.Series(slot + 2).map('{:02d}:00'.format)
+
+    o = event_order
+    orders_df = pd.DataFrame({
+        'Дата статуса': _format_timestamps(event_time),
+        'Статус заказа': status,
+        'UUID статуса заказа': uuids(rng, len(o)),
+        'Маркетплейс': MARKETPLACE,
+        'UUID маркетплейса': 'e5a15a47-f6ec-497b-b120-a83bc070304c',
+        'storeCode': stores_of['storeCode'].to_numpy()[o],
+        'Магазин': stores_of['Магазин'].to_numpy()[o],
+        'UUID магазина': stores_of['UUID магазина'].to_numpy()[o],
+        'Заказ': order_code[o],
+        'UUID заказа': order_uuid[o],
+        'Покупатель': None,
+        'UUID Покупателя': customers_of['UUID Покупателя'].to_numpy()[o],
+        'Основной телефон': customers_of['Основной телефон'].to_numpy()[o],
+        'Контактный телефон': customers_of['Контактный телефон'].to_numpy()[o],
+        'partner': PARTNER,
+        'partnerUserId': customers_of['partnerUserId'].to_numpy()[o],
+        'Закуп': np.round(goods * 0.8, 2)[o],
+        'Продажа': np.round(goods, 2)[o],
+        'Стоимость доставки': delivery[o],
+        'Сервисный сбор или налог': fee[o],
+        'Сумма заказа': total[o],
+        'Валюта': 'KZT',
+        **{name: np.where(payment[o] == name, total[o], np.nan)
+           for name in ['cash', 'kaspi', 'halyk', 'cardWoopkassa']},
+        'cardNumber': None,
+        'Количество товаров': lines[o],
+        'Комплектация': [f'Сборщик {i}' for i in rng.integers(0, 50, len(o))],
+        'UUID сборщика': None,
+        'Доставка': [f'Курьер {i}' for i in rng.integers(0, 80, len(o))],
+        'UUID курьера': None,
+        'Время доставки': windows.to_numpy(),
+        'Опоздание': np.where(rng.random(len(o)) < 0.05, 'Да', 'Нет'),
+        'Чек': None,
+        'city': stores_of['city'].to_numpy()[o],
+        'group': stores_of['group'].to_numpy()[o],
+    })[ORDERS_COLUMNS]
+
+    # Строки товаров относятся к итоговому статусу заказа
+    last_event = np.cumsum(np.bincount(event_order, minlength=orders)) - 1
+    final = orders_df.iloc[last_event].reset_index(drop=True)
+    skus_of = sku_table.iloc[line_sku].reset_index(drop=True)
+    products_df = pd.DataFrame({
+        'Дата статуса': final['Дата статуса'].to_numpy()[line_order],
+        'Статус заказа': final['Статус заказа'].to_numpy()[line_order],
+        'UUID статуса заказа': final['UUID статуса заказа'].to_numpy()[line_order],
+        'Заказ': order_code[line_order],
+        'UUID заказа': order_uuid[line_order],
+        'Комплектация': 'Собрано',
+        'SKU': skus_of['SKU'],
+        'Штрих-код': np.nan,
+        'Наименование': skus_of['Наименование'],
+        'UUID товара': skus_of['UUID товара'],
+        'Бренд': skus_of['Бренд'],
+        'Группа': skus_of['Группа'],
+        'Раздел': skus_of['Раздел'],
+        'Подраздел': None,
+        'Количество': line_qty,
+        'Закуп': np.round(line_price * 0.8, 2),
+        'Продажа': line_price,
+        'Наценка': 25.0,
+        'Валюта': 'KZT',
+        'Покупатель': None,
+        'UUID Покупателя': customers_of['UUID Покупателя'].to_numpy()[line_order],
+        'Основной телефон': customers_of['Основной телефон'].to_numpy()[line_order],
+        'Контактный телефон':
+            customers_of['Контактный телефон'].to_numpy()[line_order],
+        'partner': PARTNER,
+        'partnerUserId': customers_of['partnerUserId'].to_numpy()[line_order],
+        'storeCode': stores_of['storeCode'].to_numpy()[line_order],
+        'Магазин': stores_of['Магазин'].to_numpy()[line_order],
+        'UUID магазина': stores_of['UUID магазина'].to_numpy()[line_order],
+    })[PRODUCTS_COLUMNS]
+
+    return orders_df, products_df
+
+
+# Запись выгрузки в формате отчета: лист Data и служебный лист Worksheet
+def write_xlsx(df, path, title='Отчет Onay.kz'):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Data')
+    sheet.append(list(df.columns))
+    for row in df.itertuples(index=False):
+        sheet.append([None if v is None or v != v else v for v in row])
+    workbook.create_sheet('Worksheet').append([title])
+    workbook.save(path)
+
+
+def write_exports(orders_df, products_df, directory):
+    os.makedirs(directory, exist_ok=True)
+    paths = (os.path.join(directory, 'orders.xlsx'),
+             os.path.join(directory, 'products.xlsx'))
+    write_xlsx(orders_df, paths[0], 'Отчет по финансам Onay.kz')
+    write_xlsx(products_df, paths[1], 'Отчет по товарам Onay.kz')
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Синтетические выгрузки orders.xlsx и products.xlsx'
+    )
+    parser.add_argument('--orders', type=int, default=10_000)
+    parser.add_argument('--stores', type=int, default=60)
+    parser.add_argument('--skus', type=int, default=20_000)
+    parser.add_argument('--history', action='store_true',
+                        help='строка на каждый статус заказа')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='synthetic')
+    args = parser.parse_args()
+
+    orders_df, products_df = generate(args.orders, stores=args.stores,
+                                      skus=args.skus, history=args.history,
+                                      seed=args.seed)
+    for path in write_exports(orders_df, products_df, args.out):
+        print(path)
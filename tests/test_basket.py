@@ -0,0 +1,82 @@
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import basket
+import star
+import synth
+
+
+@pytest.fixture(scope='module')
+def prepared():
+    orders, products = synth.generate(2000, history=True, seed=3, skus=200)
+    tables = star.build(orders, products)
+    lines, names = basket.prepare(tables['line_fact'], tables['product_dim'],
+                                  tables['store_dim'])
+    return lines, names, products
+
+
+# Перебором: все подмножества каждой корзины до max_len товаров
+def _brute_force(matrix, min_support, max_len):
+    min_count = max(basket.MIN_ORDERS, int(np.ceil(min_support * matrix.shape[0])))
+    counts = Counter()
+    for row in range(matrix.shape[0]):
+        items = sorted(matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]])
+        for size in range(1, max_len + 1):
+            counts.update(combinations(items, size))
+    return {items: count for items, count in counts.items() if count >= min_count}
+
+
+@pytest.mark.parametrize('min_support, max_len', [(0.01, 3), (0.03, 2),
+                                                  (0.005, 4)])
+def test_frequent_itemsets_equal_brute_force(prepared, min_support, max_len):
+    lines, _, _ = prepared
+    matrix = basket.incidence(lines)
+    itemsets, n_orders = basket.frequent_itemsets(matrix, min_support, max_len)
+    found = {tuple(sorted(items)): count for items, count in itemsets}
+    assert len(found) == len(itemsets)
+    assert n_orders == matrix.shape[0]
+    assert found == _brute_force(matrix, min_support, max_len)
+
+
+def test_association_rules():
+    itemsets = [((0,), 10), ((1,), 5), ((0, 1), 4)]
+    # 1 → 0: доверие 4/5, лифт 0.8 / (10/20); 0 → 1 (доверие 0.4) отсеяно
+    rules = basket.association_rules(itemsets, 20, min_confidence=0.5)
+    assert rules == [((1,), 0, 4, 0.8, pytest.approx(1.6))]
+
+
+# Каждая строка товаров — одна строка корзины, заказ выполнен, если хотя бы
+# одна его строка в статусе «Выполнен»
+def test_prepare(prepared):
+    lines, names, products = prepared
+    assert len(lines) == products[['UUID заказа', 'UUID товара']].notna() \
+        .all(axis=1).sum()
+    assert len(names) > lines['Товар'].max()
+    assert all(isinstance(name, str) for name in names)
+    assert len(set(names)) == len(names)
+    done = products['Статус заказа'].eq(basket.COMPLETED) \
+        .groupby(products['UUID заказа']).any()
+    assert lines['Выполнен'].sum() == products['UUID заказа'].map(done).sum()
+
+
+def test_select_and_analyze(prepared):
+    lines, names, _ = prepared
+    first, last = basket.period(lines)
+    state = basket.normalize(lines, (first, first), None, True)
+    assert state == {'Дата': (first, first), 'abandoned': True}
+    assert basket.normalize(lines, (first, last)) == {}
+
+    selected = basket.select(lines, state)
+    assert not selected['Выполнен'].any()
+    days = np.datetime64(first, 'D').astype('int64')
+    assert (selected['Дата'] == days).all()
+
+    result = basket.analyze(basket.select(lines, {}), names)
+    assert result['orders'] == lines['Заказ'].nunique()
+    assert (result['rules']['Доверие'] >= basket.MIN_CONFIDENCE).all()
+    assert (result['itemsets']['Поддержка'] >= basket.MIN_SUPPORT).all()
+    assert isinstance(result['itemsets'], pd.DataFrame)
@@ -0,0 +1,62 @@
+import numpy as np
+
+from dates import (NO_DAY, day_to_date, days_from_civil, days_in_month,
+                   parse_timestamps, parse_windows)
+
+
+def test_parse_timestamps():
+    timestamps, days = parse_timestamps([
+        '08.01.2025 18:01:02', '29.02.2024 00:00:00', None, '08.01.2025 18:01:02'
+    ])
+    assert timestamps.tolist() == [
+        np.datetime64('2025-01-08T18:01:02', 's').item(),
+        np.datetime64('2024-02-29T00:00:00', 's').item(),
+        None,
+        np.datetime64('2025-01-08T18:01:02', 's').item(),
+    ]
+    assert days.dtype == np.int32
+    assert days[0] == np.datetime64('2025-01-08', 'D').astype('int64')
+    assert days[2] == NO_DAY
+
+
+# Неразбираемые строки и несуществующие дни дают NaT и NO_DAY
+def test_parse_timestamps_invalid():
+    timestamps, days = parse_timestamps([
+        '29.02.2023 10:00:00', '31.04.2025 10:00:00', '00.01.2025 10:00:00',
+        '08.13.2025 10:00:00', 'мусор', '8.1.2025 10:00:00', '',
+    ])
+    assert np.isnat(timestamps).all()
+    assert (days == NO_DAY).all()
+
+
+def test_days_from_civil_matches_numpy():
+    dates = np.arange(np.datetime64('1900-01-01'), np.datetime64('2100-01-01'),
+                      np.timedelta64(37, 'D'))
+    years = dates.astype('datetime64[Y]').astype('int64') + 1970
+    months = dates.astype('datetime64[M]').astype('int64') % 12 + 1
+    days = (dates - dates.astype('datetime64[M]')).astype('int64') + 1
+    assert (days_from_civil(years, months, days)
+            == dates.astype('int64')).all()
+
+
+def test_days_in_month():
+    years = np.array([2023, 2024, 1900, 2000, 2025])
+    months = np.array([2, 2, 2, 2, 4])
+    assert days_in_month(years, months).tolist() == [28, 29, 28, 29, 30]
+
+
+def test_day_to_date_maps_no_day_to_nat():
+    dates = day_to_date([0, NO_DAY, 20096])
+    assert dates[0] == np.datetime64('1970-01-01')
+    assert np.isnat(dates[1])
+    assert dates[2] == np.datetime64('2025-01-08')
+
+
+# Окно через полночь заканчивается на следующий день, окно без конца — точка
+def test_parse_windows():
+    start, end = parse_windows(['08.01.2025 22:00 - 01:00',
+                                '08.01.2025 18:01', None])
+    assert start[0] == np.datetime64('2025-01-08T22:00')
+    assert end[0] == np.datetime64('2025-01-09T01:00')
+    assert start[1] == end[1] == np.datetime64('2025-01-08T18:01')
+    assert np.isnat(start[2]) and np.isnat(end[2])
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from downsample import downsample, lttb, minmax
+
+
+def _series(n=10_000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.datetime64('2024-01-01') + np.arange(n)
+    y = np.sin(np.arange(n) / 200) + rng.normal(0, 0.05, n)
+    y[n // 8] = 25.0
+    return x, y
+
+
+def test_lttb_selects_threshold_points():
+    x, y = _series()
+    selected = lttb(x, y, 500)
+    assert len(selected) == 500
+    assert selected[0] == 0 and selected[-1] == len(y) - 1
+    assert (np.diff(selected) > 0).all()
+    # Выброс образует наибольший треугольник в своей корзине
+    assert 1250 in selected
+
+
+def test_lttb_keeps_short_series():
+    x, y = _series(100)
+    assert (lttb(x, y, 500) == np.arange(100)).all()
+    assert (lttb(x, y, 2) == np.arange(100)).all()
+
+
+# Прямая остается прямой: точки выбираются по всей длине ряда
+def test_lttb_on_line():
+    x = np.arange(1000, dtype='float64')
+    selected = lttb(x, 2 * x, 50)
+    assert len(np.unique(selected)) == 50
+    assert selected.max() == 999
+
+
+def test_minmax_keeps_extremes():
+    _, y = _series()
+    y[77] = -30.0
+    selected = minmax(y, 100)
+    assert {77, 1250} <= set(selected.tolist())
+    assert len(selected) <= 200
+
+
+def test_downsample_frame():
+    x, y = _series()
+    df = pd.DataFrame({'Дата': x, 'Сумма': y, 'Чек': -y})
+    result = downsample(df, 'Дата', ['Сумма', 'Чек'], points=600)
+    assert len(result) <= 600
+    assert result['Дата'].is_monotonic_increasing
+    assert result['Сумма'].max() == 25.0
+    assert downsample(df.iloc[:100], 'Дата', ['Сумма']).equals(df.iloc[:100])
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+import hll
+
+
+def _rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Магазин': rng.choice(['А', 'Б'], n),
+        'UUID Покупателя': rng.integers(0, n // 4, n).astype(str),
+        'UUID заказа': np.arange(n).astype(str),
+    }), np.datetime64('2025-01-01') + rng.integers(0, 10, n)
+
+
+def _sketches(df, days):
+    return hll.Sketches(*hll.merge(hll.build(df, days)))
+
+
+# Оценка в пределах трех стандартных ошибок от точного числа
+def test_estimate_close_to_exact():
+    df, days = _rows(60_000)
+    estimate = _sketches(df, days).estimate()
+    error = 3 * hll.relative_error()
+    for name, col in hll.COLUMNS.items():
+        exact = df[col].nunique()
+        assert abs(estimate[name] - exact) <= error * exact
+
+
+# Эскизы частей, слитые вместе, совпадают с эскизами всех строк сразу
+def test_merge_equals_build():
+    df, days = _rows(20_000)
+    whole_keys, whole = hll.merge(hll.build(df, days))
+    half = len(df) // 2
+    keys, merged = hll.merge(hll.build(df.iloc[:half], days[:half]),
+                             hll.build(df.iloc[half:], days[half:]))
+    pd.testing.assert_frame_equal(keys, whole_keys)
+    for name in hll.COLUMNS:
+        assert (merged[name] == whole[name]).all()
+
+
+def test_estimate_by_period_and_store():
+    df, days = _rows(20_000)
+    sketches = _sketches(df, days)
+    start = end = np.datetime64('2025-01-03')
+    selected = (days == start) & (df['Магазин'] == 'А').to_numpy()
+    estimate = sketches.estimate(start.item(), end.item(), ['А'])
+    exact = df.loc[selected, 'UUID заказа'].nunique()
+    assert abs(estimate['orders'] - exact) <= 3 * hll.relative_error() * exact
+    assert sketches.estimate(np.datetime64('2026-01-01').item()) == \
+        {'customers': 0, 'orders': 0}
+
+
+def test_frame_round_trip():
+    df, days = _rows(5_000)
+    keys, sketches = hll.merge(hll.build(df, days))
+    restored_keys, restored = hll.from_frame(hll.to_frame(keys, sketches))
+    assert (restored_keys['Дата'].to_numpy() == keys['Дата'].to_numpy()).all()
+    for name in hll.COLUMNS:
+        assert (restored[name] == sketches[name]).all()
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import kernel
+
+
+def _frame(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    stores = np.array(['Б', 'А', 'В', None], dtype=object)
+    return pd.DataFrame({
+        'Магазин': pd.Categorical(stores[rng.integers(0, 4, n)]),
+        'Город': pd.Series(stores[rng.integers(0, 4, n)], dtype=object),
+        'День': rng.integers(100, 130, n).astype('int32'),
+        'Код': rng.integers(0, 10**9, n),
+        'Сумма': np.where(rng.random(n) < 0.1, np.nan, rng.random(n) * 1000),
+    })
+
+
+def _expected(df, by):
+    grouped = df.groupby(by, sort=True, dropna=False, observed=True)
+    expected = grouped['Сумма'].sum().to_frame()
+    expected['Строки'] = grouped.size()
+    return expected.reset_index()
+
+
+# Плотный путь (категории, строки, целые) и разреженный (много сочетаний)
+# дают то же, что groupby
+@pytest.mark.parametrize('by', [['Магазин'], ['Город'], ['День'],
+                                ['Магазин', 'День'], ['Код', 'День']])
+def test_aggregate_matches_groupby(by):
+    df = _frame()
+    result = kernel.aggregate(df, by, ['Сумма'], 'Строки')
+    expected = _expected(df, by)
+    assert len(result) == len(expected)
+    for col in by:
+        assert result[col].astype(object).where(result[col].notna(), None) \
+            .tolist() == expected[col].astype(object) \
+            .where(expected[col].notna(), None).tolist()
+    np.testing.assert_allclose(result['Сумма'], expected['Сумма'])
+    assert result['Строки'].tolist() == expected['Строки'].tolist()
+
+
+def test_aggregate_empty():
+    result = kernel.aggregate(_frame().iloc[:0], ['Магазин'], ['Сумма'], 'Строки')
+    assert result.empty
+    assert list(result.columns) == ['Магазин', 'Сумма', 'Строки']
+
+
+@pytest.mark.parametrize('column', ['Магазин', 'Город', 'День', 'Код'])
+def test_factorize_decodes_sorted_codes(column):
+    values = _frame()[column]
+    codes, n, decode = kernel.factorize(values)
+    assert codes.min() >= 0 and codes.max() < n
+    decoded = pd.Series(decode(codes))
+    assert decoded.isna().tolist() == values.isna().tolist()
+    assert (decoded[values.notna()].to_numpy()
+            == values[values.notna()].to_numpy()).all()
+    # Коды упорядочены как значения, пропуски — последними
+    order = np.argsort(codes, kind='stable')
+    known = values.iloc[order].dropna().to_numpy()
+    assert (known[1:] >= known[:-1]).all()
+
+
+def test_mean_handles_empty_groups():
+    result = kernel.mean([10.0, 0.0], [4, 0])
+    assert result[0] == 2.5
+    assert np.isnan(result[1])
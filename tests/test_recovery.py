@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import funnel
+import recovery
+import schema
+import synth
+
+
+@pytest.fixture(scope='module')
+def snapshot():
+    raw, _ = synth.generate(3000, history=True, seed=11)
+    return schema.apply(raw)
+
+
+@pytest.fixture(scope='module')
+def orders(snapshot):
+    return funnel.order_sequences(snapshot, None,
+                                  ['UUID Покупателя', 'Сумма заказа'])
+
+
+# Перебором: для каждой брошенной корзины — ближайший выполненный заказ того
+# же покупателя в окне после нее; заказ возвращает только последнюю корзину
+def _brute_force(orders, days):
+    last = len(funnel.STAGES) - 1
+    window = np.timedelta64(days, 'D')
+    rows = list(zip(orders['Этап'], orders['UUID Покупателя'], orders['Начало']))
+    done = {}
+    for number, (stage, customer, start) in enumerate(rows):
+        if stage == last and not pd.isna(customer) and not pd.isna(start):
+            done.setdefault(customer, []).append((start, number))
+
+    best = {}
+    for number, (stage, customer, start) in enumerate(rows):
+        if stage == last or pd.isna(start):
+            continue
+        candidates = [(time, n) for time, n in done.get(customer, [])
+                      if start < time <= start + window]
+        if candidates:
+            _, target = min(candidates)
+            if target not in best or best[target][0] <= start:
+                best[target] = (start, number)
+    return {number for _, number in best.values()}
+
+
+def test_match_equals_brute_force(orders):
+    matched = recovery.match(orders)
+    recovered = set(matched.loc[matched['Возвращена'], 'Номер'].tolist())
+    expected = _brute_force(orders, recovery.RECOVERY_DAYS)
+    assert recovered
+    assert recovered == expected
+    # Каждая брошенная корзина — ровно одна строка результата
+    abandoned = orders['Этап'] < len(funnel.STAGES) - 1
+    assert sorted(matched['Номер']) == np.flatnonzero(abandoned).tolist()
+
+
+# Корзины без времени первого статуса остаются в потерях
+def test_match_keeps_orders_without_time(orders):
+    orders = orders.copy()
+    abandoned = np.flatnonzero(orders['Этап'] < len(funnel.STAGES) - 1)
+    orders.loc[abandoned[:5], 'Начало'] = pd.NaT
+    done = np.flatnonzero(orders['Этап'] == len(funnel.STAGES) - 1)
+    orders.loc[done[:5], 'Начало'] = pd.NaT
+    matched = recovery.match(orders)
+    assert len(matched) == len(abandoned)
+    untimed = matched['Номер'].isin(abandoned[:5])
+    assert not matched.loc[untimed, 'Возвращена'].any()
+
+
+# Таблица по (день, магазин) складывается в те же итоги, что и сопоставление
+def test_recovery_table_totals(snapshot, orders):
+    matched = recovery.match(orders)
+    totals = recovery.totals(recovery.recovery_table(snapshot))
+    returned = np.minimum(matched['Сумма'], matched['Сумма возврата'])[
+        matched['Возвращена']].sum()
+    assert totals['Брошено корзин'] == len(matched)
+    assert totals['Возвращено корзин'] == matched['Возвращена'].sum()
+    assert totals['Сумма потерь'] == pytest.approx(matched['Сумма'].sum())
+    assert totals['Возвращенная сумма'] == pytest.approx(returned)
+    assert totals['Чистые потери'] == \
+        pytest.approx(totals['Сумма потерь'] - returned)
+    assert 0 < totals['Доля возврата'] < 1
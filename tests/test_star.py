@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+import star
+from ingest import normalize
+from xlsx_reader import read_xlsx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def exports():
+    return (normalize(read_xlsx(os.path.join(ROOT, star.ORDERS))),
+            normalize(read_xlsx(os.path.join(ROOT, star.PRODUCTS))))
+
+
+@pytest.fixture(scope='module')
+def tables(exports):
+    return star.build(*exports)
+
+
+# Атрибуты магазина есть только в выгрузке заказов: строки товаров
+# не должны затирать их пропусками
+def test_store_attributes_filled(exports, tables):
+    orders, _ = exports
+    store_dim = tables['store_dim'].set_index('UUID магазина')
+    assert len(store_dim) == orders['UUID магазина'].nunique()
+    for column in ['Маркетплейс', 'city', 'group']:
+        known = orders.dropna(subset=[column]) \
+            .groupby('UUID магазина')[column].last()
+        assert len(known)
+        assert (store_dim.loc[known.index, column] == known).all()
+    assert store_dim['Маркетплейс'].notna().all()
+
+
+def test_surrogate_keys(exports, tables):
+    orders, products = exports
+    order_dim = tables['order_dim']
+    assert 'UUID магазина' not in order_dim
+    assert (order_dim['store_key'] >= 0).all()
+    for name, dim in [('order_fact', 'store_dim'), ('line_fact', 'product_dim')]:
+        fact = tables[name]
+        key = 'store_key' if dim == 'store_dim' else 'product_key'
+        assert fact[key].between(0, len(tables[dim]) - 1).all()
+    assert len(tables['order_fact']) == len(orders)
+    assert len(tables['line_fact']) == len(products)
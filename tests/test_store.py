@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import hll
+import shared
+import store
+import synth
+
+
+@pytest.fixture(scope='module')
+def orders():
+    orders, _ = synth.generate(400, history=True, seed=5)
+    return orders
+
+
+# Колонка пустая в первой выгрузке и заполнена текстом во второй: части
+# с разными типами колонки читаются вместе
+def test_sync_column_empty_then_filled(tmp_path, orders):
+    half = len(orders) // 2
+    first, second = orders.iloc[:half], orders.iloc[half:].copy()
+    assert first['Покупатель'].isna().all()
+    second['Покупатель'] = 'Покупатель ' + pd.Series(
+        np.arange(len(second)), index=second.index).astype(str)
+    paths = [str(tmp_path / 'day1.xlsx'), str(tmp_path / 'day2.xlsx')]
+    synth.write_xlsx(first, paths[0])
+    synth.write_xlsx(second, paths[1])
+
+    store_dir = str(tmp_path / 'store')
+    manifest = store.sync(paths, store_dir)
+    assert sum(seen['rows'] for seen in manifest['files'].values()) == len(orders)
+
+    rows = store.read_store(store_dir)
+    assert len(rows) == len(orders)
+    names = rows['Покупатель'].dropna()
+    assert len(names) == len(second)
+    assert names.str.startswith('Покупатель ').all()
+    assert len(shared.open_snapshot(store_dir)) == len(orders)
+
+
+# Части, уже записанные с числовым типом колонки, читаются вместе
+# с текстовыми: колонка становится текстом
+def test_concat_parts_mixed_number_and_text():
+    tables = [
+        pa.table({'Чек': pa.array([None, None], pa.float64()),
+                  'Сумма': pa.array([1, 2])}),
+        pa.table({'Чек': pa.array([1.5, None]), 'Сумма': pa.array([3.5, 4.0])}),
+        pa.table({'Чек': pa.array(['A-1', None], pa.large_string()),
+                  'Сумма': pa.array([None, None], pa.null())}),
+    ]
+    result = store.concat_parts(tables)
+    assert pa.types.is_large_string(result.schema.field('Чек').type)
+    assert result.column('Чек').to_pylist() == \
+        [None, None, '1.5', None, 'A-1', None]
+    assert result.column('Сумма').to_pylist() == [1.0, 2.0, 3.5, 4.0, None, None]
+
+
+# Выгрузка не отсортирована по дням и читается многими порциями: загрузка
+# все равно пишет по одному файлу на день
+def test_sync_writes_one_part_per_day(tmp_path, orders, monkeypatch):
+    monkeypatch.setattr(store, 'CHUNK_SIZE', 300)
+    monkeypatch.setattr(store, 'MAX_OPEN_PARTS', 50)
+    path = str(tmp_path / 'orders.xlsx')
+    synth.write_xlsx(orders.sample(frac=1, random_state=0), path)
+
+    store_dir = str(tmp_path / 'store')
+    manifest = store.sync([path], store_dir)
+    days = [part.split('/')[0] for part in manifest['parts']]
+    assert len(days) == len(set(days)) > store.MAX_OPEN_PARTS
+    orders_dir = tmp_path / 'store' / 'orders'
+    assert sorted(orders_dir.iterdir()) == \
+        sorted(orders_dir / day for day in days)
+    assert len(store.read_store(store_dir)) == len(orders)
+
+
+# Версия данных собирается по манифесту, с которым ее создали: файл
+# манифеста больше не перечитывается
+def test_dataset_uses_given_manifest(tmp_path, orders, monkeypatch):
+    import refresh
+
+    path = str(tmp_path / 'orders.xlsx')
+    synth.write_xlsx(orders, path)
+    store_dir = str(tmp_path / 'store')
+    manifest = store.sync([path], store_dir)
+
+    def read_manifest(store_dir):
+        raise AssertionError('manifest re-read')
+    monkeypatch.setattr(store, 'read_manifest', read_manifest)
+    monkeypatch.setattr(shared, 'read_manifest', read_manifest)
+    dataset = refresh.Dataset(manifest, store_dir)
+    assert dataset.version == manifest['version']
+    assert len(dataset.data) == len(orders)
+    assert len(dataset.rollup) and len(dataset.sketches.days)
+
+
+def _sketches_equal(left, right):
+    (left_keys, left), (right_keys, right) = left, right
+    return left_keys.astype(str).equals(right_keys.astype(str)) \
+        and all((left[name] == right[name]).all() for name in hll.COLUMNS)
+
+
+# Вторая загрузка переписывает эскизы только тех дней, в которые пришли
+# строки; итог совпадает с эскизами, построенными по всему хранилищу
+def test_sync_rewrites_sketches_of_touched_days(tmp_path, orders):
+    paths = [str(tmp_path / 'day1.xlsx'), str(tmp_path / 'day2.xlsx')]
+    synth.write_xlsx(orders.iloc[:-20], paths[0])
+    synth.write_xlsx(orders.iloc[-20:], paths[1])
+    store_dir = str(tmp_path / 'store')
+    before = dict(store.sync(paths[:1], store_dir)['sketches'])
+    after = store.sync(paths, store_dir)['sketches']
+
+    touched = set(store.day_partitions(orders.iloc[-20:]))
+    assert {day for day in after if before.get(day) != after[day]} == touched
+    files = {str(path.relative_to(tmp_path / 'store')) for path in
+             (tmp_path / 'store' / 'sketches').glob('*/*.parquet')}
+    assert files == set(after.values())
+
+    full = hll.merge(store._sketch(store.read_store(store_dir)))
+    assert _sketches_equal(store.read_sketches(store_dir), full)
+
+
+# Эскизы, записанные одним файлом, раскладываются по дням при синхронизации
+def test_sync_splits_single_sketches_file(tmp_path, orders):
+    path = str(tmp_path / 'orders.xlsx')
+    synth.write_xlsx(orders, path)
+    store_dir = str(tmp_path / 'store')
+    manifest = store.sync([path], store_dir)
+    expected = store.read_sketches(store_dir)
+
+    hll.to_frame(*expected).to_parquet(
+        str(tmp_path / 'store' / 'sketches-00001.parquet'), index=False)
+    manifest['sketches'] = 'sketches-00001.parquet'
+    store._write_manifest(store_dir, manifest)
+    assert _sketches_equal(store.read_sketches(store_dir), expected)
+
+    manifest = store.sync([path], store_dir)
+    assert isinstance(manifest['sketches'], dict)
+    assert _sketches_equal(store.read_sketches(store_dir), expected)
+    assert not (tmp_path / 'store' / 'sketches-00001.parquet').exists()
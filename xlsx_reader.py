@@ -0,0 +1,227 @@
+import posixpath
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+import pandas as pd
+
+# Пространства имен SpreadsheetML
+NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Размер порции строк по умолчанию
+CHUNK_SIZE = 50_000
+
+
+# Номер колонки по ссылке на ячейку: 'AB12' -> 27
+def column_index(ref):
+    index = 0
+    for char in ref:
+        if char.isdigit():
+            break
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+# Путь к XML листа по его имени (через workbook.xml и связи книги)
+def sheet_path(archive, sheet_name='Data'):
+    targets = {}
+    with archive.open('xl/_rels/workbook.xml.rels') as f:
+        for _, elem in iterparse(f):
+            if elem.tag == f'{NS_PKG_REL}Relationship':
+                targets[elem.get('Id')] = elem.get('Target')
+
+    sheets = []
+    with archive.open('xl/workbook.xml') as f:
+        for _, elem in iterparse(f):
+            if elem.tag == f'{NS_MAIN}sheet':
+                sheets.append((elem.get('name'), elem.get(f'{NS_REL}id')))
+
+    if not sheets:
+        raise ValueError('В книге нет листов')
+    rel_id = dict(sheets).get(sheet_name, sheets[0][1])
+    target = targets[rel_id]
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join('xl', target))
+
+
+# Таблица общих строк; элементы очищаются сразу после чтения
+def read_shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as f:
+        for _, elem in iterparse(f):
+            if elem.tag == f'{NS_MAIN}si':
+                # Текст с форматированием разбит на несколько <r><t>
+                strings.append(''.join(
+                    t.text or '' for t in elem.iter(f'{NS_MAIN}t')
+                ))
+                elem.clear()
+    return strings
+
+
+# Значение ячейки с учетом ее типа
+def _cell_value(cell, shared_strings):
+    cell_type = cell.get('t')
+    if cell_type == 'inlineStr':
+        return ''.join(t.text or '' for t in cell.iter(f'{NS_MAIN}t'))
+
+    value = cell.findtext(f'{NS_MAIN}v')
+    if value is None:
+        return None
+    if cell_type == 's':
+        return shared_strings[int(value)]
+    if cell_type in ('str', 'e'):
+        return value
+    if cell_type == 'b':
+        return value == '1'
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+# Типы колонок по возрастанию: тип колонки от порции к порции только
+# расширяется, и порции одного листа складываются без конфликтов типов
+KINDS = ['empty', 'int', 'float', 'text']
+
+
+# Тип колонки по значениям порции с учетом типа предыдущих порций
+def _kind(values, previous=None):
+    types = {type(v) for v in values}
+    if types - {int, float, type(None)}:
+        kind = 'text'
+    elif float in types:
+        kind = 'float'
+    elif int in types:
+        kind = 'float' if type(None) in types else 'int'
+    else:
+        kind = 'empty'
+    if previous is None:
+        return kind
+    # Целые с пропусками (в этой порции или в пустой предыдущей) — дробные
+    if {kind, previous} == {'int', 'empty'}:
+        return 'float'
+    return max(kind, previous, key=KINDS.index)
+
+
+# Типизация колонки порции: числа -> int64/float64, остальное -> строки.
+# Пустая колонка — object из None: в Arrow это тип null, который сводится
+# с любым типом той же колонки в других порциях и выгрузках
+def _typed_column(values, kind):
+    if kind == 'empty':
+        return pd.Series([None] * len(values), dtype=object)
+    if kind == 'int':
+        return np.array(values, dtype='int64')
+    if kind == 'float':
+        return np.array([np.nan if v is None else v for v in values],
+                        dtype='float64')
+    # Текстовые ячейки остаются текстом (телефоны, SKU не превращаются в числа)
+    return pd.Series(
+        [v if v is None or isinstance(v, str) else str(v) for v in values],
+        dtype='str'
+    )
+
+
+def _make_chunk(header, columns, kinds):
+    return pd.DataFrame({
+        name: _typed_column(values, kind)
+        for name, values, kind in zip(header, columns, kinds)
+    })
+
+
+def _dtype_kind(column):
+    if pd.api.types.is_integer_dtype(column.dtype):
+        return 'int'
+    if pd.api.types.is_float_dtype(column.dtype):
+        return 'float'
+    if column.dtype == object and column.isna().all():
+        return 'empty'
+    return 'text'
+
+
+# Порция, прочитанная до расширения типов, приводится к типам более
+# поздней порции like того же листа (целые -> дробные, числа -> текст)
+def conform(chunk, like):
+    chunk = chunk.copy()
+    for name in chunk.columns:
+        kind = _dtype_kind(like[name])
+        if _dtype_kind(chunk[name]) == kind:
+            continue
+        values = chunk[name].astype(object)
+        # Целые, ставшие дробными из-за пропусков, в текст идут без '.0'
+        values = [None if pd.isna(v) else
+                  int(v) if isinstance(v, float) and v.is_integer() else v
+                  for v in values]
+        chunk[name] = _typed_column(values, kind)
+    return chunk
+
+
+# Потоковое чтение листа порциями по chunksize строк. Тип колонки
+# порции учитывает все прочитанные порции (см. KINDS)
+def iter_chunks(path, sheet_name='Data', chunksize=CHUNK_SIZE):
+    with zipfile.ZipFile(path) as archive:
+        shared_strings = read_shared_strings(archive)
+
+        with archive.open(sheet_path(archive, sheet_name)) as f:
+            header = None
+            columns = None
+            kinds = None
+            rows_in_chunk = 0
+            chunks_yielded = 0
+            sheet_data = None
+
+            for event, elem in iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == f'{NS_MAIN}sheetData':
+                        sheet_data = elem
+                    continue
+                if elem.tag != f'{NS_MAIN}row':
+                    continue
+
+                values = {}
+                for cell in elem.iter(f'{NS_MAIN}c'):
+                    values[column_index(cell.get('r'))] = _cell_value(
+                        cell, shared_strings
+                    )
+                # Обработанная строка больше не нужна — освобождаем дерево
+                sheet_data.clear()
+
+                if header is None:
+                    width = max(values) + 1 if values else 0
+                    header = [values.get(i) for i in range(width)]
+                    columns = [[] for _ in header]
+                    kinds = [None] * width
+                    continue
+                if not values:
+                    continue
+
+                for i, column in enumerate(columns):
+                    column.append(values.get(i))
+                rows_in_chunk += 1
+
+                if rows_in_chunk == chunksize:
+                    kinds = [_kind(v, k) for v, k in zip(columns, kinds)]
+                    yield _make_chunk(header, columns, kinds)
+                    columns = [[] for _ in header]
+                    rows_in_chunk = 0
+                    chunks_yielded += 1
+
+            if header is None:
+                return
+            # Хвост порции; пустой лист дает одну порцию только с заголовком
+            if rows_in_chunk or not chunks_yielded:
+                kinds = [_kind(v, k) for v, k in zip(columns, kinds)]
+                yield _make_chunk(header, columns, kinds)
+
+
+# Замена pd.read_excel: склейка порций в один DataFrame (типы — по
+# последней порции, самые широкие)
+def read_xlsx(path, sheet_name='Data', chunksize=CHUNK_SIZE):
+    chunks = list(iter_chunks(path, sheet_name, chunksize))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat([conform(chunk, chunks[-1]) for chunk in chunks],
+                     ignore_index=True)